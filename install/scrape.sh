@@ -5,6 +5,8 @@ set -e
 
 APP_NAME="Nun Scrape"
 SCRIPT_NAME="scrape.py"
+# Shared helpers the script imports; installed next to it
+MODULE_NAME="crawlkit.py"
 ICON_NAME="crawling.png"
 INSTALL_DIR="$HOME/.local/share/nun-scrape"
 DESKTOP_FILE="$HOME/.local/share/applications/nun-scrape.desktop"
@@ -14,6 +16,7 @@ echo "[+] Installing $APP_NAME..."
 mkdir -p "$INSTALL_DIR"
 
 cp "$(dirname "$0")/../src/$SCRIPT_NAME" "$INSTALL_DIR/"
+cp "$(dirname "$0")/../src/$MODULE_NAME" "$INSTALL_DIR/"
 cp "$(dirname "$0")/../assets/images/$ICON_NAME" "$INSTALL_DIR/"
 
 echo "[+] Creating desktop launcher..."
@@ -45,6 +48,7 @@ if [[ "$build_deb" == "y" ]]; then
     mkdir -p "$TMP_DIR/usr/share/icons"
 
     cp "$(dirname "$0")/../src/$SCRIPT_NAME" "$TMP_DIR/usr/local/bin/$SCRIPT_NAME"
+    cp "$(dirname "$0")/../src/$MODULE_NAME" "$TMP_DIR/usr/local/bin/$MODULE_NAME"
     cp "$(dirname "$0")/../assets/images/$ICON_NAME" "$TMP_DIR/usr/share/icons/nun-scrape.png"
 
     cat > "$TMP_DIR/usr/share/applications/nun-scrape.desktop" <<EOL
@@ -0,0 +1,159 @@
+# assets.py
+import json
+import os
+import tempfile
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# How downloaded media is laid out under images/ and videos/
+MEDIA_LAYOUTS = ("flat", "content-addressed")
+
+
+def normalize_asset_url(url):
+    """Returns the form of an asset URL used to spot duplicates.
+
+    Scheme and host are lowercased, default ports and fragments dropped and
+    an empty path becomes "/"; the query is kept, since it often selects a
+    different image size or version.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username or parts.password:
+        userinfo = parts.username or ""
+        if parts.password:
+            userinfo += f":{parts.password}"
+        host = f"{userinfo}@{host}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+class AssetRegistry:
+    """Crawl-wide record of the media URLs already downloaded or in progress.
+
+    A URL is claimed before any network call, so the logo or sprite repeated
+    on every page is fetched once. Finished downloads are appended to a JSON
+    Lines file and skipped by later runs too, as long as the saved file is
+    still on disk.
+    """
+
+    FILENAME = "asset_registry.jsonl"
+
+    def __init__(self, base_path, skip_previous=True):
+        self.path = os.path.join(base_path, self.FILENAME)
+        self.skipped = 0
+        self._lock = threading.Lock()
+        # normalized URL -> saved path (None while downloading)
+        self._assets = {}
+        self._known = self._load() if skip_previous else {}
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def claim(self, url):
+        """Returns True if url should be downloaded by the caller.
+
+        False means another page already claimed it, in this run or in an
+        earlier one.
+        """
+        key = normalize_asset_url(url)
+        with self._lock:
+            if key in self._assets or key in self._known:
+                self.skipped += 1
+                return False
+            self._assets[key] = None
+            return True
+
+    def release(self, url):
+        """Gives a claim back after a failed download, so it can be retried."""
+        with self._lock:
+            self._assets.pop(normalize_asset_url(url), None)
+
+    def record(self, url, path):
+        """Records a finished download."""
+        key = normalize_asset_url(url)
+        with self._lock:
+            self._assets[key] = path
+            self._file.write(json.dumps({"url": key, "path": path}) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def _load(self):
+        known = {}
+        if not os.path.exists(self.path):
+            return known
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                known[record["url"]] = record["path"]
+        # Files deleted since are downloaded again
+        return {url: path for url, path in known.items() if os.path.isfile(path)}
+
+
+class ContentStore:
+    """Content-addressed media layout: one file per distinct body.
+
+    A file is stored as <folder>/ab/cd/abcd...<ext>, named by the SHA-1 of
+    its bytes, so identical files from different URLs are kept once, names
+    never collide and no directory grows past a few hundred entries.
+    media_manifest.jsonl maps every source URL to its stored file.
+    """
+
+    MANIFEST = "media_manifest.jsonl"
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.path = os.path.join(base_path, self.MANIFEST)
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def blob_path(folder, digest, ext):
+        return os.path.join(folder, digest[:2], digest[2:4], digest + ext.lower())
+
+    @staticmethod
+    def temp_path(folder):
+        """Returns a new empty file in folder to stream a download into."""
+        fd, path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        os.close(fd)
+        return path
+
+    def add(self, temp_path, folder, digest, ext, url, page_url=None, size=None):
+        """Moves a finished download to its blob path.
+
+        Returns (path, is_new); when the blob already exists the temp file
+        is deleted instead.
+        """
+        path = self.blob_path(folder, digest, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            is_new = not os.path.exists(path)
+            if is_new:
+                os.replace(temp_path, path)
+            else:
+                os.remove(temp_path)
+            record = {
+                "url": url,
+                "page_url": page_url,
+                "blob": os.path.relpath(path, self.base_path),
+                "sha1": digest,
+                "size": size,
+            }
+            self._file.write(json.dumps(record) + "\n")
+        return path, is_new
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,415 @@
+# bench.py
+"""Micro-benchmarks for the scraper engine.
+
+Usage:
+    python bench.py extract page1.html page2.html ...
+    python bench.py parsers page1.html page2.html ...
+    python bench.py sqlite --pages 100000
+    python bench.py graph --pages 1000000 --links 20
+    python bench.py charset page1.html page2.html ...
+    python bench.py scope --rules 5000 --urls 1000000
+
+Pages saved with the "Save raw HTML" option make a good corpus.
+"""
+
+import argparse
+import fnmatch
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from urllib.parse import urljoin, urlparse, urlsplit
+
+import charset_normalizer
+import numpy as np
+from bs4 import BeautifulSoup
+
+from charset import decode_html, sniff_encoding
+from extract import PARSERS, extract_html, extract_page
+from linkgraph import LinkGraph, analyze
+from scope import GLOB_CHARS, RuleSet
+from sinks import SqliteSink
+
+BASE_URL = "https://example.com/bench/"
+
+
+def _timed(func, repeat):
+    """Returns the best wall time of repeat runs of func()."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _load_pages(paths):
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    return pages
+
+
+def legacy_extract(soup, url):
+    """The multi-pass extraction ScraperCore used before extract_page()."""
+    title = (
+        soup.find("title").string.strip()
+        if soup.find("title") and soup.find("title").string
+        else ""
+    )
+    desc_tag = soup.find("meta", attrs={"name": "description"})
+    desc = desc_tag["content"].strip() if desc_tag and desc_tag.get("content") else ""
+    keys_tag = soup.find("meta", attrs={"name": "keywords"})
+    keys = keys_tag["content"].strip() if keys_tag and keys_tag.get("content") else ""
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.extract()
+    text = soup.get_text(separator="\n", strip=True)
+    links = [
+        urljoin(url, a["href"])
+        for a in soup.find_all("a", href=True)
+        if urlparse(urljoin(url, a["href"])).scheme in ("http", "https")
+    ]
+    images = [urljoin(url, img["src"]) for img in soup.find_all("img", src=True)]
+    videos = []
+    for video in soup.find_all("video"):
+        sources = video.find_all("source", src=True)
+        if sources:
+            videos.extend(urljoin(url, source["src"]) for source in sources)
+        elif video.get("src"):
+            videos.append(urljoin(url, video["src"]))
+    # _process_links walked the <a> tags a second time
+    for a in soup.find_all("a", href=True):
+        link = urljoin(url, a["href"])
+        urlparse(link)
+    return {
+        "title": title,
+        "description": desc,
+        "keywords": keys,
+        "text": text,
+        "links": links,
+        "images": images,
+        "videos": videos,
+    }
+
+
+def bench_extract(args):
+    pages = _load_pages(args.pages)
+    soups = [BeautifulSoup(html, "html.parser") for html in pages]
+
+    # Parity first: both implementations must agree on every page
+    for path, html, soup in zip(args.pages, pages, soups):
+        new = extract_page(soup, BASE_URL)
+        new["links"] = [link for link, _ in new["links"]]
+        old = legacy_extract(BeautifulSoup(html, "html.parser"), BASE_URL)
+        for key in old:
+            if old[key] != new[key]:
+                print(f"MISMATCH in {path}: {key}")
+
+    # legacy_extract mutates the soup, so each run gets a fresh parse
+    def run_legacy():
+        for html in pages:
+            legacy_extract(BeautifulSoup(html, "html.parser"), BASE_URL)
+
+    def run_parse():
+        for html in pages:
+            BeautifulSoup(html, "html.parser")
+
+    def run_single_pass():
+        for soup in soups:
+            extract_page(soup, BASE_URL)
+
+    parse = _timed(run_parse, args.repeat)
+    legacy = _timed(run_legacy, args.repeat) - parse
+    single = _timed(run_single_pass, args.repeat)
+    size = sum(len(html) for html in pages) / 1e6
+    print(f"{len(pages)} pages, {size:.1f} MB (parse time excluded)")
+    print(f"legacy multi-pass: {legacy * 1000:9.1f} ms")
+    print(f"single pass:       {single * 1000:9.1f} ms  ({legacy / single:.1f}x)")
+
+
+def bench_parsers(args):
+    pages = _load_pages(args.pages)
+
+    # Parity: every backend must produce the same features as html.parser.
+    # Only malformed markup (e.g. stray CDATA) is expected to differ.
+    mismatches = 0
+    for path, html in zip(args.pages, pages):
+        reference = extract_html(html, BASE_URL, "html.parser")
+        for parser in PARSERS[1:]:
+            features = extract_html(html, BASE_URL, parser)
+            for key in reference:
+                if reference[key] != features[key]:
+                    mismatches += 1
+                    print(f"MISMATCH in {path}: {parser} {key}")
+    print(f"parity: {mismatches} mismatching features")
+
+    size = sum(len(html) for html in pages) / 1e6
+    print(f"{len(pages)} pages, {size:.1f} MB (parse + extract)")
+    baseline = None
+    for parser in PARSERS:
+
+        def run():
+            for html in pages:
+                extract_html(html, BASE_URL, parser)
+
+        elapsed = _timed(run, args.repeat)
+        baseline = baseline or elapsed
+        print(
+            f"{parser:12} {elapsed * 1000:9.1f} ms  {size / elapsed:6.1f} MB/s"
+            f"  ({baseline / elapsed:.1f}x)"
+        )
+
+
+def _synthetic_pages(count, links_per_page, text_size):
+    text = ("lorem ipsum dolor sit amet " * (text_size // 27 + 1))[:text_size]
+    for i in range(count):
+        yield {
+            "url": f"https://host{i % 50}.example.com/page/{i}",
+            "title": f"Page {i}",
+            "description": "",
+            "keywords": "",
+            "text": text,
+            "links": [
+                f"https://host{j % 50}.example.com/page/{(i * 31 + j) % count}"
+                for j in range(links_per_page)
+            ],
+        }
+
+
+def bench_sqlite(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("insert", "upsert"):
+            sink = SqliteSink(tmp, batch_size=args.batch)
+            start = time.perf_counter()
+            for page_data in _synthetic_pages(args.pages, args.links, args.text):
+                sink.write(page_data, depth=1)
+            sink.close()
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label}: {args.pages} pages x {args.links} links in {elapsed:.2f} s"
+                f" = {args.pages / elapsed:,.0f} pages/s,"
+                f" {args.pages * args.links / elapsed:,.0f} links/s"
+            )
+        size = os.path.getsize(os.path.join(tmp, "data.sqlite")) / 1e6
+        print(f"database size: {size:.1f} MB")
+
+
+def bench_graph(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = LinkGraph(tmp)
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        for i in range(args.pages):
+            # Skewed targets, so some pages collect many more links than others
+            targets = (rng.pareto(1.2, args.links) * 1000).astype(int) % args.pages
+            graph.add_page(
+                f"https://example.com/page/{i}",
+                1,
+                [f"https://example.com/page/{t}" for t in targets.tolist()],
+            )
+        added = time.perf_counter() - start
+        print(
+            f"add: {args.pages} pages x {args.links} links in {added:.2f} s"
+            f" = {graph.edge_count / added:,.0f} links/s"
+        )
+
+        start = time.perf_counter()
+        matrix = graph.to_csr()
+        built = time.perf_counter() - start
+        csr_size = (matrix.indptr.nbytes + matrix.indices.nbytes) / 1e6
+        print(f"csr: {matrix.nnz:,} edges in {built:.2f} s, {csr_size:.1f} MB")
+
+        start = time.perf_counter()
+        _, _, _, iterations = analyze(matrix)
+        ranked = time.perf_counter() - start
+        print(f"pagerank + degrees: {iterations} iterations in {ranked:.2f} s")
+
+
+CHARSET_ENCODINGS = ("utf-8", "cp1252", "koi8-r", "shift_jis", "gbk", "utf-16")
+
+
+def _charset_corpus(pages):
+    """Yields (body, Content-Type, expected text) for every page encoded
+    every way, declared in the header, in a <meta> tag or not at all."""
+    for html in pages:
+        for encoding in CHARSET_ENCODINGS:
+            body = html.encode(encoding, errors="replace")
+            # What a correct decoder sees, unencodable characters and all
+            expected = body.decode(encoding).lstrip("\ufeff")
+            yield body, f"text/html; charset={encoding}", expected
+            yield body, "text/html", expected
+            if encoding != "utf-16":
+                meta = f'<meta charset="{encoding}">'.encode("ascii")
+                yield meta + body, "text/html", meta.decode() + expected
+
+
+def _detect_whole_body(body, content_type):
+    """The old path: the header charset, else detection over every byte."""
+    label = content_type.partition("charset=")[2]
+    return label or charset_normalizer.detect(body)["encoding"] or "utf-8"
+
+
+def bench_charset(args):
+    corpus = list(_charset_corpus(_load_pages(args.pages)))
+    size = sum(len(body) for body, _, _ in corpus) / 1e6
+    print(f"{len(corpus)} bodies, {size:.1f} MB")
+
+    def sniffed(body, content_type):
+        return sniff_encoding(body, content_type)[0]
+
+    for label, pick in (("whole-body detect", _detect_whole_body), ("sniff", sniffed)):
+        correct = 0
+        for body, content_type, expected in corpus:
+            try:
+                correct += decode_html(body, pick(body, content_type)) == expected
+            except LookupError:
+                pass
+
+        def run():
+            for body, content_type, _ in corpus:
+                pick(body, content_type)
+
+        elapsed = _timed(run, args.repeat)
+        print(
+            f"{label:18} {elapsed * 1000:9.1f} ms  {size / elapsed:8.1f} MB/s"
+            f"  {correct}/{len(corpus)} decoded correctly"
+        )
+
+
+def _scope_rules(count, rng):
+    """count rules in a realistic mix: mostly hosts, path prefixes and
+    extensions, with some globs and regexes."""
+    rules = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.3:
+            rules.append(f"site{i}.example.org")
+        elif kind < 0.6:
+            rules.append(f"/section{i}/")
+        elif kind < 0.7:
+            rules.append(f".ext{i}")
+        elif kind < 0.9:
+            rules.append(f"*/archive{i}/*.html")
+        else:
+            rules.append(f"re:[?&]page{i}=\\d+")
+    return rules
+
+
+def _scope_urls(count, rules, rng):
+    """URLs on the rules' hosts, sections, archives and parameters, but
+    numbered past the rules too, so only some of them match."""
+    urls = []
+    for i in range(count):
+        n = rng.randrange(len(rules) * 2)
+        if rng.random() < 0.5:
+            urls.append(f"https://site{n}.example.org/section{n}/page{i}.html")
+        else:
+            urls.append(f"https://www.example.com/archive{n}/item{i}.html?page{n}=2")
+    return urls
+
+
+def _match_each(rules, url):
+    """The uncompiled way: every rule tried in turn."""
+    parts = urlsplit(url)
+    for rule in rules:
+        if rule.startswith("re:"):
+            if re.search(rule[3:], url):
+                return True
+        elif GLOB_CHARS.intersection(rule):
+            target = url
+            if rule.startswith("/"):
+                target = url[len(parts.scheme) + 3 + len(parts.netloc) :]
+            if fnmatch.fnmatchcase(target, rule):
+                return True
+        elif rule.startswith("/"):
+            if parts.path.startswith(rule):
+                return True
+        elif rule.startswith("."):
+            if parts.path.lower().endswith(rule.lower()):
+                return True
+        else:
+            host = parts.hostname or ""
+            if host == rule or host.endswith("." + rule):
+                return True
+    return False
+
+
+def bench_scope(args):
+    rng = random.Random(0)
+    rules = _scope_rules(args.rules, rng)
+    urls = _scope_urls(args.urls, rules, rng)
+
+    start = time.perf_counter()
+    ruleset = RuleSet(rules)
+    print(f"{len(rules)} rules compiled in {time.perf_counter() - start:.3f} s")
+
+    matched = 0
+
+    def run():
+        nonlocal matched
+        matches = ruleset.matches
+        matched = sum(1 for url in urls if matches(url))
+
+    elapsed = _timed(run, args.repeat)
+    print(
+        f"compiled     {elapsed:8.2f} s  {len(urls) / elapsed:11,.0f} URLs/s"
+        f"  {matched / len(urls):.0%} matched"
+    )
+
+    # One rule at a time is far slower, so it only runs over a sample
+    sample = urls[: args.sample]
+    mismatches = sum(_match_each(rules, url) != ruleset.matches(url) for url in sample)
+    elapsed = _timed(lambda: [_match_each(rules, url) for url in sample], 1)
+    print(
+        f"rule by rule {elapsed:8.2f} s  {len(sample) / elapsed:11,.0f} URLs/s"
+        f"  ({len(sample)} URLs, {mismatches} disagree with compiled)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    extract = sub.add_parser("extract", help="single-pass vs legacy extraction")
+    extract.add_argument("pages", nargs="+", help="saved HTML files")
+    extract.add_argument("--repeat", type=int, default=3)
+    extract.set_defaults(func=bench_extract)
+
+    parsers = sub.add_parser("parsers", help="parity and throughput per backend")
+    parsers.add_argument("pages", nargs="+", help="saved HTML files")
+    parsers.add_argument("--repeat", type=int, default=3)
+    parsers.set_defaults(func=bench_parsers)
+
+    sqlite = sub.add_parser("sqlite", help="SqliteSink write throughput")
+    sqlite.add_argument("--pages", type=int, default=100000)
+    sqlite.add_argument("--links", type=int, default=50)
+    sqlite.add_argument("--text", type=int, default=2000, help="bytes per page")
+    sqlite.add_argument("--batch", type=int, default=SqliteSink.BATCH_SIZE)
+    sqlite.set_defaults(func=bench_sqlite)
+
+    graph = sub.add_parser("graph", help="link graph build and PageRank")
+    graph.add_argument("--pages", type=int, default=1000000)
+    graph.add_argument("--links", type=int, default=20)
+    graph.set_defaults(func=bench_graph)
+
+    charset = sub.add_parser("charset", help="encoding sniffing vs detection")
+    charset.add_argument("pages", nargs="+", help="saved HTML files")
+    charset.add_argument("--repeat", type=int, default=3)
+    charset.set_defaults(func=bench_charset)
+
+    scope = sub.add_parser("scope", help="compiled URL scope rules")
+    scope.add_argument("--rules", type=int, default=5000)
+    scope.add_argument("--urls", type=int, default=1000000)
+    scope.add_argument("--sample", type=int, default=2000, help="URLs rule by rule")
+    scope.add_argument("--repeat", type=int, default=1)
+    scope.set_defaults(func=bench_scope)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
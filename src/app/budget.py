@@ -0,0 +1,148 @@
+# budget.py
+"""Crawl budgets: how deep, how many pages, how many bytes and how long.
+
+Every limit applies to the whole crawl and, separately, to each host, so
+one large site can't use up a crawl that follows external links.
+"""
+
+import collections
+import threading
+import time
+from urllib.parse import urlsplit
+
+MB = 1024 * 1024
+# Seconds between progress lines on what is left of the budget
+REPORT_INTERVAL = 10
+
+
+class CrawlBudget:
+    """Depth, page, byte and time limits for a crawl, overall and per host.
+
+    admit() is asked before a URL is queued, so a URL over budget never
+    takes a frontier slot; pages are charged when queued, bytes when
+    fetched. Time runs from the start of the crawl, or from the first URL
+    queued for a host. A limit of 0 (or None) means no limit. Each limit
+    is reported through log() once, when it is first reached.
+    """
+
+    def __init__(
+        self,
+        max_depth=3,
+        max_pages=0,
+        max_bytes=0,
+        max_seconds=0,
+        host_depth=0,
+        host_pages=0,
+        host_bytes=0,
+        host_seconds=0,
+        log=None,
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.host_depth = host_depth
+        self.host_pages = host_pages
+        self.host_bytes = host_bytes
+        self.host_seconds = host_seconds
+        self.log = log
+        self.started = time.monotonic()
+        self.pages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._host_pages = collections.Counter()
+        self._host_bytes = collections.Counter()
+        # host -> (depth of its first queued URL, monotonic time queued)
+        self._host_start = {}
+        self._reported = set()
+        self._last_report = self.started
+
+    def admit(self, url, depth):
+        """Returns True and charges one page if url fits the budget."""
+        if depth > self.max_depth or not self.allows(url):
+            return False
+        host = urlsplit(url).netloc
+        entry_depth = self._host_start.get(host, (depth,))[0]
+        if self.host_depth and depth - entry_depth > self.host_depth:
+            return False
+        if self.max_pages and self.pages >= self.max_pages:
+            self._report("pages", None, f"Page budget of {self.max_pages} used up")
+            return False
+        if self.host_pages and self._host_pages[host] >= self.host_pages:
+            self._report(
+                "pages", host, f"Page budget of {self.host_pages} used up for {host}"
+            )
+            return False
+        self.charge(url, depth)
+        return True
+
+    def charge(self, url, depth):
+        """Counts a queued page without checking, e.g. when resuming."""
+        host = urlsplit(url).netloc
+        self.pages += 1
+        self._host_pages[host] += 1
+        if host not in self._host_start:
+            self._host_start[host] = (depth, time.monotonic())
+
+    def allows(self, url):
+        """False once the time or byte budget of the crawl or url's host
+        is used up; checked again before fetching a queued URL."""
+        now = time.monotonic()
+        if self.max_seconds and now - self.started >= self.max_seconds:
+            self._report("time", None, "Time budget used up")
+            return False
+        if self.max_bytes and self.bytes >= self.max_bytes:
+            self._report("bytes", None, "Byte budget used up")
+            return False
+        if not (self.host_seconds or self.host_bytes):
+            return True
+        host = urlsplit(url).netloc
+        start = self._host_start.get(host)
+        if self.host_seconds and start and now - start[1] >= self.host_seconds:
+            self._report("time", host, f"Time budget used up for {host}")
+            return False
+        if self.host_bytes and self._host_bytes[host] >= self.host_bytes:
+            self._report("bytes", host, f"Byte budget used up for {host}")
+            return False
+        return True
+
+    def add_bytes(self, url, size):
+        """Charges size bytes fetched from url. Safe to call from any thread."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            self.bytes += size
+            self._host_bytes[host] += size
+
+    def due(self):
+        """True once per REPORT_INTERVAL; the crawl loop then logs summary()."""
+        now = time.monotonic()
+        if now - self._last_report < REPORT_INTERVAL:
+            return False
+        self._last_report = now
+        return True
+
+    def summary(self):
+        """What is left of the crawl-wide limits, or "" if there are none."""
+        left = []
+        if self.max_pages:
+            left.append(
+                f"{max(0, self.max_pages - self.pages)} of {self.max_pages} pages"
+            )
+        if self.max_bytes:
+            remaining = max(0, self.max_bytes - self.bytes) / MB
+            left.append(f"{remaining:.1f} of {self.max_bytes / MB:.1f} MB")
+        if self.max_seconds:
+            remaining = max(0, self.max_seconds - (time.monotonic() - self.started))
+            left.append(f"{remaining:.0f} of {self.max_seconds} s")
+        return f"Budget left: {', '.join(left)}" if left else ""
+
+    def _report(self, kind, host, message):
+        key = (kind, host)
+        if key in self._reported:
+            return
+        with self._lock:
+            if key in self._reported:
+                return
+            self._reported.add(key)
+        if self.log:
+            self.log(f"{message}; skipping further URLs.")
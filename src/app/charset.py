@@ -0,0 +1,97 @@
+# charset.py
+"""Picks a page's character encoding from its bytes, cheaply.
+
+The order follows browsers: byte order mark, the Content-Type charset,
+then <meta charset> or http-equiv in the first SNIFF_BYTES. Pages that
+declare nothing are tried as strict UTF-8; statistical detection runs
+only when that fails too, and only over the start of the body.
+"""
+
+import codecs
+import re
+
+import charset_normalizer
+
+SNIFF_BYTES = 4096
+DETECT_BYTES = 64 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+# Labels browsers treat as a superset encoding (WHATWG Encoding Standard)
+ALIASES = {
+    "ascii": "cp1252",
+    "us-ascii": "cp1252",
+    "iso-8859-1": "cp1252",
+    "iso8859-1": "cp1252",
+    "latin1": "cp1252",
+    "latin-1": "cp1252",
+    "l1": "cp1252",
+    "iso-8859-9": "cp1254",
+    "latin5": "cp1254",
+    "iso-8859-11": "cp874",
+    "tis-620": "cp874",
+    "gb2312": "gbk",
+    "x-gbk": "gbk",
+    "euc-kr": "cp949",
+    "ks_c_5601-1987": "cp949",
+    "x-sjis": "shift_jis",
+}
+
+_HEADER_CHARSET = re.compile(r"charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+_META_CHARSET = re.compile(rb"<meta\s[^>]*?charset\s*=\s*[\"']?\s*([\w.:-]+)", re.I)
+
+
+def sniff_encoding(body, content_type=None):
+    """Returns (Python codec name, how it was found) for an HTML body.
+
+    The second item is "bom", "header", "meta", "utf-8" or "detected".
+    """
+    for bom, encoding in BOMS:
+        if body.startswith(bom):
+            return encoding, "bom"
+
+    if content_type:
+        match = _HEADER_CHARSET.search(content_type)
+        encoding = match and _codec(match.group(1))
+        if encoding:
+            return encoding, "header"
+
+    match = _META_CHARSET.search(body, 0, SNIFF_BYTES)
+    if match:
+        encoding = _codec(match.group(1).decode("ascii", "replace"))
+        if encoding:
+            # A meta tag readable as ASCII can't really mean UTF-16
+            if encoding.startswith("utf-16"):
+                encoding = "utf-8"
+            return encoding, "meta"
+
+    try:
+        body.decode("utf-8")
+        return "utf-8", "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    guess = charset_normalizer.from_bytes(body[:DETECT_BYTES]).best()
+    encoding = _codec(guess.encoding) if guess else None
+    return encoding or "cp1252", "detected"
+
+
+def decode_html(body, encoding):
+    """Decodes body, dropping a BOM and replacing undecodable bytes."""
+    for bom, bom_encoding in BOMS:
+        if body.startswith(bom) and encoding == bom_encoding:
+            body = body[len(bom) :]
+            break
+    return str(body, encoding, errors="replace")
+
+
+def _codec(label):
+    label = label.strip().strip("\"'").lower()
+    try:
+        return codecs.lookup(ALIASES.get(label, label)).name
+    except LookupError:
+        return None
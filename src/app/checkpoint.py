@@ -0,0 +1,94 @@
+# checkpoint.py
+import json
+import os
+import time
+
+
+class CrawlCheckpoint:
+    """Append-only JSON Lines journal of a crawl's frontier.
+
+    Every queued URL and every finished page is one line, so writing a
+    checkpoint is a cheap append. Replaying the journal rebuilds the seen
+    set and the pending frontier; the results themselves are streamed to
+    the JSON Lines results file.
+
+    Records are held in memory until flush(), which the crawl loop calls
+    only after the result sinks have flushed, so a page is never journaled
+    as finished while its result could still be lost in a crash.
+    """
+
+    FILENAME = "crawl_checkpoint.jsonl"
+
+    def __init__(self, base_path, interval=10):
+        self.path = os.path.join(base_path, self.FILENAME)
+        self.interval = interval
+        self._file = None
+        # Records not yet written, in order
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def load(self, start_url):
+        """Returns (queued, finished) recorded for start_url, or None.
+
+        queued is a list of (url, depth) in the order they were queued;
+        finished is the set of URLs already done (or failed).
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        queued = []
+        finished = set()
+        started = False
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half written
+                    continue
+                event = record.get("event")
+                if event == "start":
+                    if record["start_url"] != start_url:
+                        return None
+                    started = True
+                if event == "queued":
+                    queued.append((record["url"], record["depth"]))
+                elif event == "finished":
+                    finished.add(record["url"])
+        if not started:
+            return None
+        return queued, finished
+
+    def open(self, start_url, resume):
+        """Opens the journal, appending when resuming, truncating otherwise."""
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if not resume:
+            self._write({"event": "start", "start_url": start_url})
+
+    def queued(self, url, depth):
+        self._write({"event": "queued", "url": url, "depth": depth})
+
+    def finished(self, url):
+        self._write({"event": "finished", "url": url})
+
+    def due(self):
+        """True once per interval; the crawl loop then flushes to disk."""
+        return time.monotonic() - self._last_flush >= self.interval
+
+    def flush(self):
+        """Writes the pending records to disk; call after the sinks flush."""
+        if self._pending:
+            self._file.write("".join(self._pending))
+            self._pending.clear()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        self._pending.append(json.dumps(record) + "\n")
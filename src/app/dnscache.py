@@ -0,0 +1,119 @@
+# dnscache.py
+"""In-process cache of name lookups for the crawler's connections.
+
+The system resolver is a blocking call per new connection, and a crawl
+that follows external links opens connections to thousands of hosts.
+Answers are kept for ttl seconds and failures for negative_ttl seconds, so
+a dead domain linked from every page costs one lookup, not one per link.
+Concurrent lookups of the same name share one resolver call, and hosts
+can be resolved in the background as soon as they are queued.
+
+getaddrinfo() does not expose record TTLs, so one configured TTL applies
+to every answer, as in nscd or systemd-resolved's cache.
+"""
+
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Background lookups running at once
+PREFETCH_WORKERS = 4
+
+
+class DnsCache:
+    def __init__(self, ttl=300, negative_ttl=60, prefetch=True):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = self.lookups = self.failures = 0
+        self._lock = threading.Lock()
+        # (host, port) -> (expiry, addresses or the lookup's exception)
+        self._answers = {}
+        # (host, port) -> Future of a lookup in progress
+        self._pending = {}
+        # netlocs already handed to prefetch(), to skip them cheaply
+        self._prefetched = set()
+        self._pool = (
+            ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="dns")
+            if prefetch
+            else None
+        )
+
+    def resolve(self, host, port):
+        """Returns getaddrinfo() results for a TCP connection to host:port.
+
+        Raises socket.gaierror (or UnicodeError for a malformed name), possibly
+        from the cache, if the name does not resolve.
+        """
+        key = (host, port)
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer and answer[0] > time.monotonic():
+                self.hits += 1
+                return self._unpack(answer[1])
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+        if not owner:
+            # Someone is already asking; wait for their answer
+            with self._lock:
+                self.hits += 1
+            return self._unpack(future.result())
+
+        try:
+            result = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+            ttl = self.ttl
+        except (OSError, UnicodeError) as e:
+            # Includes names too long or malformed to look up at all
+            result = e
+            ttl = self.negative_ttl
+        with self._lock:
+            self.lookups += 1
+            if isinstance(result, Exception):
+                self.failures += 1
+            if ttl > 0:
+                self._answers[key] = (time.monotonic() + ttl, result)
+            del self._pending[key]
+        future.set_result(result)
+        return self._unpack(result)
+
+    def prefetch(self, url):
+        """Resolves url's host in the background if it isn't known yet."""
+        parts = urlsplit(url)
+        if self._pool is None or parts.netloc in self._prefetched:
+            return
+        self._prefetched.add(parts.netloc)
+        try:
+            port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+        except ValueError:
+            return
+        if parts.hostname and port:
+            self._pool.submit(self._prefetch, parts.hostname, port)
+
+    def summary(self):
+        """One log line on cache use."""
+        asked = self.hits + self.lookups
+        return (
+            f"DNS: {asked} resolutions, {self.hits / asked if asked else 0:.0%}"
+            f" from cache, {self.lookups} lookups, {self.failures} failed"
+        )
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _prefetch(self, host, port):
+        try:
+            self.resolve(host, port)
+        except (OSError, UnicodeError):
+            pass
+
+    @staticmethod
+    def _unpack(result):
+        if isinstance(result, Exception):
+            # A fresh copy, as the cached one may be raised in many threads
+            raise type(result)(*result.args)
+        return result
@@ -0,0 +1,245 @@
+# extract.py
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+from urllib.parse import urljoin, urlsplit
+
+import lxml.etree
+import lxml.html
+
+from charset import decode_html
+
+# Parser backends: BeautifulSoup tree builders, or raw lxml.html without soup
+PARSERS = ("html.parser", "lxml", "lxml-raw")
+
+# Strings get_text() keeps by default (comments, doctypes etc. are skipped)
+TEXT_TYPES = (NavigableString, CData)
+SKIP_TEXT_TAGS = ("script", "style")
+
+
+def extract_html(
+    html,
+    url,
+    parser="html.parser",
+    want_text=True,
+    encoding=None,
+    want_anchors=False,
+):
+    """Parses html with the chosen backend and returns extract_page() features.
+
+    Every backend returns the same feature dict, so callers never need to
+    know which parser ran. html is a str, or bytes in encoding (see
+    charset.sniff_encoding()). UTF-8 bytes go to lxml as they are; other
+    encodings are decoded first, as libxml2 drops everything after an
+    invalid byte in them.
+    """
+    if isinstance(html, bytes):
+        if parser == "lxml-raw" and encoding == "utf-8":
+            return extract_tree(
+                _lxml_root(html, encoding), url, want_text, want_anchors
+            )
+        html = decode_html(html, encoding or "utf-8")
+    if parser == "lxml-raw":
+        return extract_tree(_lxml_root(html), url, want_text, want_anchors)
+    if parser not in PARSERS:
+        raise ValueError(f"Unknown HTML parser: {parser}")
+    return extract_page(BeautifulSoup(html, parser), url, want_text, want_anchors)
+
+
+def extract_page(soup, url, want_text=True, want_anchors=False):
+    """Walks the parsed page once and returns every feature the scraper uses.
+
+    The result holds title/description/keywords, the visible text (only
+    when want_text is set), resolved http(s) links as (link, netloc) pairs,
+    and resolved image and video source URLs. With want_anchors, "anchors"
+    maps each link to the text of the first <a> with text that points to it.
+    """
+    features = {
+        "title": "",
+        "description": "",
+        "keywords": "",
+        "text": "",
+        "links": [],
+        "images": [],
+        "videos": [],
+    }
+    if want_anchors:
+        features["anchors"] = {}
+    seen_title = seen_desc = seen_keys = False
+    texts = []
+    # Open <video> tags as [attrs, source_urls]; closed when their subtree ends
+    open_videos = []
+
+    stack = [(None, iter(soup.contents))]
+    while stack:
+        parent, children = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if parent is not None and parent.name == "video":
+                _close_video(open_videos.pop(), url, features["videos"])
+            continue
+
+        if not isinstance(node, Tag):
+            if want_text and type(node) in TEXT_TYPES:
+                stripped = node.strip()
+                if stripped:
+                    texts.append(stripped)
+            continue
+
+        name = node.name
+        attrs = node.attrs
+        if name in SKIP_TEXT_TAGS:
+            continue
+
+        if name == "a":
+            href = attrs.get("href")
+            if href is not None:
+                link = urljoin(url, href)
+                parts = urlsplit(link)
+                if parts.scheme in ("http", "https"):
+                    features["links"].append((link, parts.netloc))
+                    if want_anchors and link not in features["anchors"]:
+                        _add_anchor(features, link, node.get_text(" "))
+        elif name == "img":
+            if attrs.get("src") is not None:
+                features["images"].append(urljoin(url, attrs["src"]))
+        elif name == "meta":
+            meta_name = attrs.get("name")
+            if meta_name == "description" and not seen_desc:
+                seen_desc = True
+                features["description"] = (attrs.get("content") or "").strip()
+            elif meta_name == "keywords" and not seen_keys:
+                seen_keys = True
+                features["keywords"] = (attrs.get("content") or "").strip()
+        elif name == "title" and not seen_title:
+            seen_title = True
+            features["title"] = node.string.strip() if node.string else ""
+        elif name == "video":
+            open_videos.append([attrs, []])
+        elif name == "source" and open_videos:
+            if attrs.get("src") is not None:
+                open_videos[-1][1].append(urljoin(url, attrs["src"]))
+
+        if node.contents:
+            stack.append((node, iter(node.contents)))
+        elif name == "video":
+            _close_video(open_videos.pop(), url, features["videos"])
+
+    if want_text:
+        features["text"] = "\n".join(texts)
+    return features
+
+
+def _add_anchor(features, link, text):
+    text = " ".join(text.split())
+    if text:
+        features["anchors"][link] = text
+
+
+def _close_video(video, url, videos):
+    """<source> children win over the <video src> attribute."""
+    attrs, sources = video
+    if sources:
+        videos.extend(sources)
+    elif attrs.get("src"):
+        videos.append(urljoin(url, attrs["src"]))
+
+
+def _lxml_root(html, encoding=None):
+    try:
+        if encoding:
+            # Parsers are cheap, and not safe to share between threads
+            parser = lxml.html.HTMLParser(encoding=encoding)
+            return lxml.html.document_fromstring(html, parser=parser)
+        return lxml.html.document_fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        # Empty documents have no root; treat them as an empty page
+        return lxml.html.document_fromstring("<html></html>")
+
+
+def extract_tree(root, url, want_text=True, want_anchors=False):
+    """extract_page() for an lxml.html tree, skipping BeautifulSoup entirely."""
+    features = {
+        "title": "",
+        "description": "",
+        "keywords": "",
+        "text": "",
+        "links": [],
+        "images": [],
+        "videos": [],
+    }
+    if want_anchors:
+        features["anchors"] = {}
+    seen_title = seen_desc = seen_keys = False
+    texts = []
+    open_videos = []
+    # bs4 stores <template> strings as TemplateString, which get_text() skips
+    templates = 0
+
+    def add_text(value):
+        if want_text and value and not templates:
+            stripped = value.strip()
+            if stripped:
+                texts.append(stripped)
+
+    # Text order in lxml: element.text, its children, then element.tail
+    stack = [(None, iter((root,)))]
+    while stack:
+        parent, children = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if parent is not None:
+                if parent.tag == "video":
+                    _close_video(open_videos.pop(), url, features["videos"])
+                elif parent.tag == "template":
+                    templates -= 1
+                add_text(parent.tail)
+            continue
+
+        name = node.tag
+        if not isinstance(name, str) or name in SKIP_TEXT_TAGS:
+            # Comments, processing instructions, script and style bodies
+            add_text(node.tail)
+            continue
+
+        attrs = node.attrib
+        if name == "a":
+            href = attrs.get("href")
+            if href is not None:
+                link = urljoin(url, href)
+                parts = urlsplit(link)
+                if parts.scheme in ("http", "https"):
+                    features["links"].append((link, parts.netloc))
+                    # Like get_text(), which finds no text inside a template
+                    if want_anchors and not templates:
+                        if link not in features["anchors"]:
+                            _add_anchor(features, link, node.text_content())
+        elif name == "img":
+            if attrs.get("src") is not None:
+                features["images"].append(urljoin(url, attrs["src"]))
+        elif name == "meta":
+            meta_name = attrs.get("name")
+            if meta_name == "description" and not seen_desc:
+                seen_desc = True
+                features["description"] = (attrs.get("content") or "").strip()
+            elif meta_name == "keywords" and not seen_keys:
+                seen_keys = True
+                features["keywords"] = (attrs.get("content") or "").strip()
+        elif name == "title" and not seen_title:
+            seen_title = True
+            if len(node) == 0 and node.text:
+                features["title"] = node.text.strip()
+        elif name == "video":
+            open_videos.append([attrs, []])
+        elif name == "source" and open_videos:
+            if attrs.get("src") is not None:
+                open_videos[-1][1].append(urljoin(url, attrs["src"]))
+        elif name == "template":
+            templates += 1
+
+        add_text(node.text)
+        stack.append((node, iter(node)))
+
+    if want_text:
+        features["text"] = "\n".join(texts)
+    return features
@@ -0,0 +1,166 @@
+# frontier.py
+import collections
+import heapq
+import itertools
+from urllib.parse import urlparse
+
+
+class Frontier:
+    """FIFO queue of (url, depth) paired with a hashed seen-or-queued set.
+
+    push() and the membership test are O(1), so a URL is only ever queued
+    once no matter how many pages link to it.
+    """
+
+    def __init__(self):
+        self._queue = collections.deque()
+        # URLs popped while their host was busy, kept in per-host FIFO order
+        self._parked = collections.defaultdict(collections.deque)
+        self._parked_count = 0
+        self._seen = set()
+
+    def __len__(self):
+        return len(self._queue) + self._parked_count
+
+    def __contains__(self, url):
+        return url in self._seen
+
+    def push(self, url, depth, anchor=""):
+        """Queues url unless it was already seen. Returns True if queued."""
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._queue.append((url, depth))
+        return True
+
+    def add_inlink(self, url, anchor=""):
+        """Another link to a seen URL; FIFO order doesn't depend on links."""
+
+    def mark_seen(self, url):
+        """Remembers url as seen without queueing it, e.g. when resuming."""
+        self._seen.add(url)
+
+    def pop(self, is_ready=None):
+        """Returns the next (url, depth), or None if nothing can be taken.
+
+        When is_ready(host) is given, URLs whose host is not ready are parked
+        and handed out first once that host frees up.
+        """
+        if is_ready is None:
+            if self._parked_count:
+                return self._take_parked(next(iter(self._parked)))
+            return self._queue.popleft() if self._queue else None
+
+        for host in list(self._parked):
+            if is_ready(host):
+                return self._take_parked(host)
+
+        while self._queue:
+            url, depth = self._queue.popleft()
+            host = urlparse(url).netloc
+            if host not in self._parked and is_ready(host):
+                return url, depth
+            self._parked[host].append((url, depth))
+            self._parked_count += 1
+        return None
+
+    def _take_parked(self, host):
+        item = self._parked[host].popleft()
+        if not self._parked[host]:
+            del self._parked[host]
+        self._parked_count -= 1
+        return item
+
+
+class PriorityFrontier:
+    """Best-first frontier with the same interface as Frontier.
+
+    pop() returns the queued URL with the highest scorer.score(url, depth,
+    anchor, inlinks); equal scores come out in the order they were queued.
+    Each further link to a queued URL counts as an inlink and can raise its
+    score. URLs whose host is busy are parked per host, still by score.
+    """
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        # Entries are [-score, sequence, url, depth]; a rescored URL gets a
+        # new entry and its old one is emptied (url None) and skipped
+        self._heap = []
+        self._parked = {}
+        self._sequence = itertools.count()
+        # url -> (entry, inlinks) for URLs still queued
+        self._queued = {}
+        self._seen = set()
+
+    def __len__(self):
+        return len(self._queued)
+
+    def __contains__(self, url):
+        return url in self._seen
+
+    def push(self, url, depth, anchor=""):
+        """Queues url unless it was already seen. Returns True if queued."""
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._add(url, depth, self.scorer.score(url, depth, anchor), 1)
+        return True
+
+    def add_inlink(self, url, anchor=""):
+        """Counts another link to url and rescores it if it is still queued."""
+        queued = self._queued.get(url)
+        if queued is None:
+            return
+        entry, inlinks = queued
+        inlinks += 1
+        depth = entry[3]
+        score = max(-entry[0], self.scorer.score(url, depth, anchor, inlinks))
+        entry[2] = None
+        self._add(url, depth, score, inlinks)
+
+    def mark_seen(self, url):
+        """Remembers url as seen without queueing it, e.g. when resuming."""
+        self._seen.add(url)
+
+    def pop(self, is_ready=None):
+        """Returns the best (url, depth), or None if nothing can be taken.
+
+        When is_ready(host) is given, URLs whose host is not ready are parked
+        until it frees up.
+        """
+        while True:
+            best = None
+            for host, parked in self._parked.items():
+                if (best is None or parked[0] < best[0]) and (
+                    is_ready is None or is_ready(host)
+                ):
+                    best = (parked[0], host)
+
+            while self._heap and (best is None or self._heap[0] < best[0]):
+                entry = heapq.heappop(self._heap)
+                if entry[2] is None:
+                    continue
+                host = urlparse(entry[2]).netloc
+                if is_ready is None or is_ready(host):
+                    return self._take(entry)
+                heapq.heappush(self._parked.setdefault(host, []), entry)
+
+            if best is None:
+                return None
+            entry, host = best
+            parked = self._parked[host]
+            heapq.heappop(parked)
+            if not parked:
+                del self._parked[host]
+            if entry[2] is not None:
+                return self._take(entry)
+
+    def _add(self, url, depth, score, inlinks):
+        entry = [-score, next(self._sequence), url, depth]
+        self._queued[url] = (entry, inlinks)
+        heapq.heappush(self._heap, entry)
+
+    def _take(self, entry):
+        url, depth = entry[2], entry[3]
+        del self._queued[url]
+        return url, depth
@@ -0,0 +1,64 @@
+# gating.py
+"""Header-first checks that stop unwanted transfers before the body."""
+
+import re
+
+# Content-Type prefixes accepted per kind of resource. A missing header is
+# let through; octet-stream is common for media served from object stores.
+ACCEPTED_TYPES = {
+    "page": ("text/html", "application/xhtml+xml"),
+    "image": ("image/", "application/octet-stream", "binary/octet-stream"),
+    "video": (
+        "video/",
+        "audio/",
+        "application/ogg",
+        "application/octet-stream",
+        "binary/octet-stream",
+    ),
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ResourceRejected(Exception):
+    """A response was turned down by its headers or size; the rest of its
+    body is never downloaded."""
+
+
+def content_size(resp):
+    """Full size of the resource from Content-Range or Content-Length."""
+    match = re.match(r"bytes \d+-\d+/(\d+)", resp.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1))
+    try:
+        return int(resp.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def check_response(resp, kind, max_bytes=None):
+    """Raises ResourceRejected if resp's headers rule it out for kind.
+
+    max_bytes of None or 0 means no size limit.
+    """
+    content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith(ACCEPTED_TYPES[kind]):
+        raise ResourceRejected(f"{kind} rejected, Content-Type is {content_type}")
+    size = content_size(resp)
+    if max_bytes and size is not None and size > max_bytes:
+        raise ResourceRejected(f"{size} bytes is over the {kind} limit of {max_bytes}")
+
+
+def read_body(resp, max_bytes=None):
+    """Reads resp's body, giving up as soon as it grows past max_bytes.
+
+    Covers servers that send no Content-Length, or a wrong one.
+    """
+    chunks = []
+    size = 0
+    for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise ResourceRejected(f"body is over the limit of {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -0,0 +1,203 @@
+# linkgraph.py
+import array
+import csv
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+from sinks import BUFFER_SIZE
+
+
+class LinkGraph:
+    """The crawl's link graph, kept as integer IDs in flat arrays.
+
+    URLs are interned to IDs in first-seen order and edges are appended to
+    two int32 arrays, so an edge costs 8 bytes while the crawl runs. The
+    arrays become a deduplicated CSR matrix only for saving and analysis.
+    Pages never fetched (external links, depth limit) are nodes with depth -1.
+    """
+
+    GRAPH_FILE = "link_graph.npz"
+    URLS_FILE = "link_graph_urls.txt"
+    RANKS_FILE = "link_graph.csv"
+    REPORT_FILE = "link_graph_report.json"
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self._ids = {}
+        self._urls = []
+        self._depth = array.array("i")
+        self._src = array.array("i")
+        self._dst = array.array("i")
+
+    def __len__(self):
+        return len(self._urls)
+
+    @property
+    def edge_count(self):
+        return len(self._src)
+
+    def add_page(self, url, depth, links):
+        """Records a fetched page and its outgoing links (plain URLs)."""
+        page = self._intern(url)
+        self._depth[page] = depth
+        intern = self._intern
+        self._src.extend([page] * len(links))
+        self._dst.extend([intern(link) for link in links])
+
+    def load(self):
+        """Loads a graph saved by an earlier run. Returns False if none."""
+        graph_path = os.path.join(self.base_path, self.GRAPH_FILE)
+        urls_path = os.path.join(self.base_path, self.URLS_FILE)
+        if not (os.path.exists(graph_path) and os.path.exists(urls_path)):
+            return False
+        with np.load(graph_path) as saved:
+            indptr, indices, depth = saved["indptr"], saved["indices"], saved["depth"]
+        with open(urls_path, encoding="utf-8") as f:
+            for line in f:
+                self._intern(line.rstrip("\n"))
+        if len(self._urls) != len(depth):
+            raise ValueError(f"{self.URLS_FILE} does not match {self.GRAPH_FILE}")
+        self._depth = array.array("i", depth.astype(np.int32).tobytes())
+        src = np.repeat(np.arange(len(depth), dtype=np.int32), np.diff(indptr))
+        self._src.frombytes(src.tobytes())
+        self._dst.frombytes(indices.astype(np.int32).tobytes())
+        return True
+
+    def to_csr(self):
+        """Returns the n x n adjacency matrix, one entry per distinct edge.
+
+        Self-links are dropped; they say nothing about a page's importance.
+        """
+        n = len(self._urls)
+        src = np.frombuffer(self._src, dtype=np.int32)
+        dst = np.frombuffer(self._dst, dtype=np.int32)
+        keep = src != dst
+        src, dst = src[keep], dst[keep]
+        matrix = sparse.csr_matrix(
+            (np.ones(len(src), dtype=np.float32), (src, dst)), shape=(n, n)
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return matrix
+
+    def save(self):
+        """Writes the CSR arrays, the URL table, per-page ranks and a report.
+
+        Returns the report dict.
+        """
+        matrix = self.to_csr()
+        depth = np.frombuffer(self._depth, dtype=np.int32)
+        np.savez_compressed(
+            os.path.join(self.base_path, self.GRAPH_FILE),
+            indptr=matrix.indptr,
+            indices=matrix.indices,
+            depth=depth,
+        )
+        with open(
+            os.path.join(self.base_path, self.URLS_FILE),
+            "w",
+            encoding="utf-8",
+            buffering=BUFFER_SIZE,
+        ) as f:
+            f.writelines(url + "\n" for url in self._urls)
+
+        in_degree, out_degree, ranks, iterations = analyze(matrix)
+        self._save_ranks(depth, in_degree, out_degree, ranks)
+        report = self._report(matrix, depth, in_degree, ranks, iterations)
+        with open(
+            os.path.join(self.base_path, self.REPORT_FILE), "w", encoding="utf-8"
+        ) as f:
+            json.dump(report, f, indent=4)
+        return report
+
+    def _intern(self, url):
+        page = self._ids.get(url)
+        if page is None:
+            page = self._ids[url] = len(self._urls)
+            self._urls.append(url)
+            self._depth.append(-1)
+        return page
+
+    def _save_ranks(self, depth, in_degree, out_degree, ranks):
+        """Writes one row per node, highest PageRank first."""
+        with open(
+            os.path.join(self.base_path, self.RANKS_FILE),
+            "w",
+            newline="",
+            encoding="utf-8",
+            buffering=BUFFER_SIZE,
+        ) as f:
+            writer = csv.writer(f)
+            writer.writerow(["url", "depth", "in_degree", "out_degree", "pagerank"])
+            for page in np.argsort(-ranks, kind="stable").tolist():
+                writer.writerow(
+                    [
+                        self._urls[page],
+                        depth[page] if depth[page] >= 0 else "",
+                        in_degree[page],
+                        out_degree[page],
+                        f"{ranks[page]:.6g}",
+                    ]
+                )
+
+    def _report(self, matrix, depth, in_degree, ranks, iterations, top=20):
+        crawled = depth >= 0
+        # Fetched pages nothing links to, apart from the start page(s)
+        orphans = np.flatnonzero(crawled & (in_degree == 0) & (depth > 0))
+        histogram = np.bincount(depth[crawled]) if crawled.any() else []
+        return {
+            "nodes": len(self._urls),
+            "edges": int(matrix.nnz),
+            "crawled_pages": int(crawled.sum()),
+            "uncrawled_links": int((~crawled).sum()),
+            "pagerank_iterations": iterations,
+            "depth_histogram": {
+                str(level): int(count) for level, count in enumerate(histogram)
+            },
+            "orphan_pages": [self._urls[page] for page in orphans.tolist()],
+            "top_pagerank": [
+                [self._urls[page], float(ranks[page])]
+                for page in np.argsort(-ranks, kind="stable")[:top].tolist()
+            ],
+            "top_in_degree": [
+                [self._urls[page], int(in_degree[page])]
+                for page in np.argsort(-in_degree, kind="stable")[:top].tolist()
+            ],
+        }
+
+
+def pagerank(matrix, damping=0.85, tol=1e-9, max_iter=100):
+    """Power-iteration PageRank over a CSR adjacency matrix.
+
+    Rank from pages without outgoing links is spread evenly over all pages.
+    Returns (ranks, iterations); ranks sum to 1.
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    out_degree = np.diff(matrix.indptr)
+    dangling = out_degree == 0
+    inv_out = np.zeros(n)
+    np.divide(1.0, out_degree, out=inv_out, where=~dangling)
+    # Transposed once, so every step is a single sparse mat-vec
+    incoming = matrix.T.tocsr()
+    ranks = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iter + 1):
+        spread = (damping * ranks[dangling].sum() + 1.0 - damping) / n
+        new_ranks = damping * (incoming @ (ranks * inv_out)) + spread
+        delta = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if delta < tol:
+            break
+    return ranks, iteration
+
+
+def analyze(matrix):
+    """Returns (in_degree, out_degree, pagerank, iterations) per node."""
+    in_degree = np.bincount(matrix.indices, minlength=matrix.shape[0])
+    out_degree = np.diff(matrix.indptr)
+    ranks, iterations = pagerank(matrix)
+    return in_degree, out_degree, ranks, iterations
@@ -0,0 +1,105 @@
+# recrawl.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+
+def content_hash(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+class RecrawlCache:
+    """Validators and previous results for incremental re-crawls.
+
+    For every fetched page it keeps the ETag, Last-Modified, a content hash
+    and the extracted features; for every downloaded asset the validators,
+    hash and saved path. Shared by all worker threads.
+    """
+
+    FILENAME = "crawl_cache.sqlite"
+    COMMIT_EVERY = 100
+
+    def __init__(self, base_path):
+        self.path = os.path.join(base_path, self.FILENAME)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT,"
+            " last_modified TEXT, hash TEXT, features TEXT, with_text INTEGER)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS assets (url TEXT PRIMARY KEY, etag TEXT,"
+            " last_modified TEXT, hash TEXT, path TEXT)"
+        )
+        self._db.commit()
+
+    def get_page(self, url, want_text):
+        """Returns (etag, last_modified, hash, features) or None.
+
+        Results extracted without text cannot serve a crawl that wants text.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, hash, features, with_text FROM pages"
+                " WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None or (want_text and not row[4]):
+            return None
+        return row[0], row[1], row[2], json.loads(row[3])
+
+    def store_page(self, url, etag, last_modified, body_hash, features, with_text):
+        self._write(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                etag,
+                last_modified,
+                body_hash,
+                json.dumps(features),
+                int(with_text),
+            ),
+        )
+
+    def get_asset(self, url):
+        """Returns (etag, last_modified, hash, path) or None."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT etag, last_modified, hash, path FROM assets WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def store_asset(self, url, etag, last_modified, body_hash, path):
+        self._write(
+            "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?)",
+            (url, etag, last_modified, body_hash, path),
+        )
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    def _write(self, sql, params):
+        with self._lock:
+            self._db.execute(sql, params)
+            self._pending += 1
+            if self._pending >= self.COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+
+
+def conditional_headers(headers, cached):
+    """Adds If-None-Match/If-Modified-Since for a cached (etag, modified, ...)."""
+    if not cached:
+        return headers
+    headers = dict(headers)
+    if cached[0]:
+        headers["If-None-Match"] = cached[0]
+    if cached[1]:
+        headers["If-Modified-Since"] = cached[1]
+    return headers
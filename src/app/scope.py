@@ -0,0 +1,229 @@
+# scope.py
+"""Include/exclude rules deciding which discovered links are in scope.
+
+Rules are written one per word:
+
+    re:<regex>     searched anywhere in the URL
+    *.pdf, /a/*/b  globs (*, ?, [...]); matched against the whole URL, or
+                   against the path (and query) when they start with "/"
+    /blog/         a path prefix
+    .pdf           a file extension
+    example.com    a host, with its subdomains
+
+A rule list is compiled once into a RuleSet, so a link costs about the
+same to check against ten rules as against thousands.
+"""
+
+import collections
+import fnmatch
+import re
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+GLOB_CHARS = frozenset("*?[")
+# Scheme and host in front of a glob that starts with "/"
+_URL_START = r"[^:/?#]+://[^/?#]*"
+# Host (without user info or port) and path of an absolute URL
+_URL_PARTS = re.compile(
+    r"[^:/?#]+://(?:[^@/?#]*@)?(\[[^\]]*\]|[^:/?#]*)[^/?#]*([^?#]*)"
+)
+_GLOB_WILDCARD = re.compile(r"\*|\?|\[[^\]]*\]?")
+# Words of a URL; rules are indexed by a word every match must contain
+_TOKEN = re.compile(r"[A-Za-z0-9]+")
+# Stands for "some character that is not part of a word" in rule skeletons
+_BREAK = "\0"
+# Anchors that can't sit inside a word
+_WORD_EDGES = frozenset(
+    (
+        sre_constants.AT_BEGINNING,
+        sre_constants.AT_BEGINNING_STRING,
+        sre_constants.AT_BOUNDARY,
+        sre_constants.AT_END,
+        sre_constants.AT_END_STRING,
+    )
+)
+# Length of the substrings rules without a whole word are indexed by
+GRAM = 4
+
+
+class RuleSet:
+    """A compiled list of rules; matches() is True if any rule matches.
+
+    Hosts, path prefixes and extensions are set lookups. Globs and regexes
+    are not joined into one alternation, which Python's re would try branch
+    by branch at every position; instead each is indexed by a word (or
+    failing that a GRAM-character substring) every match must contain,
+    picking the one the fewest other rules share. A URL then only runs the
+    few patterns indexed under its own words.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self._hosts = set()
+        self._extensions = set()
+        # length -> path prefixes of that length
+        self._prefixes = {}
+        patterns = []
+        for rule in self.rules:
+            if rule.startswith("re:"):
+                try:
+                    compiled = re.compile(rule[3:])
+                except re.error as e:
+                    raise ValueError(f"bad regex in {rule!r}: {e}") from e
+                patterns.append((compiled.search, _regex_skeleton(compiled)))
+            elif GLOB_CHARS.intersection(rule):
+                pattern = fnmatch.translate(rule)
+                if rule.startswith("/"):
+                    pattern = _URL_START + pattern
+                compiled = re.compile(pattern)
+                patterns.append((compiled.match, _glob_skeleton(rule)))
+            elif rule.startswith("/"):
+                self._prefixes.setdefault(len(rule), set()).add(rule)
+            elif rule.startswith(".") and "/" not in rule:
+                self._extensions.add(rule.lower())
+            elif rule:
+                self._hosts.add(rule.lower().rstrip("."))
+        self._lengths = sorted(self._prefixes)
+        self._index_patterns(patterns)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def matches(self, url):
+        if self._hosts or self._prefixes or self._extensions:
+            parts = _URL_PARTS.match(url)
+            host, path = parts.groups() if parts else ("", "")
+            if self._hosts:
+                host = host.lower().rstrip(".")
+                while host:
+                    if host in self._hosts:
+                        return True
+                    host = host.partition(".")[2]
+            for length in self._lengths:
+                if length > len(path):
+                    break
+                if path[:length] in self._prefixes[length]:
+                    return True
+            if self._extensions:
+                name = path.rpartition("/")[2]
+                dot = name.rfind(".")
+                if dot > 0 and name[dot:].lower() in self._extensions:
+                    return True
+
+        for index, keys in ((self._by_token, _tokens), (self._by_gram, _grams)):
+            if index:
+                for key in index.keys() & keys(url):
+                    for matches in index[key]:
+                        if matches(url):
+                            return True
+        return any(matches(url) for matches in self._unindexed)
+
+    def _index_patterns(self, patterns):
+        counts = collections.Counter()
+        candidates = []
+        for matches, skeleton in patterns:
+            # Words with a break on both sides are whole words of the URL
+            tokens = {
+                word.group()
+                for piece in skeleton
+                for word in _TOKEN.finditer(piece)
+                if 0 < word.start() and word.end() < len(piece)
+            }
+            grams = set()
+            if not tokens:
+                grams = {
+                    literal[i : i + GRAM]
+                    for piece in skeleton
+                    for literal in piece.split(_BREAK)
+                    for i in range(len(literal) - GRAM + 1)
+                }
+            counts.update(tokens or grams)
+            candidates.append((matches, tokens, grams))
+
+        self._by_token = {}
+        self._by_gram = {}
+        # Rules with no literal to index by, run one by one
+        self._unindexed = []
+        for matches, tokens, grams in candidates:
+            if tokens:
+                key = min(tokens, key=counts.__getitem__)
+                self._by_token.setdefault(key, []).append(matches)
+            elif grams:
+                key = min(grams, key=counts.__getitem__)
+                self._by_gram.setdefault(key, []).append(matches)
+            else:
+                self._unindexed.append(matches)
+
+
+def _tokens(url):
+    return set(_TOKEN.findall(url))
+
+
+def _grams(url):
+    return {url[i : i + GRAM] for i in range(len(url) - GRAM + 1)}
+
+
+def _glob_skeleton(glob):
+    """The literal pieces of glob; its ends count as breaks when anchored
+    to the ends of the URL."""
+    pieces = _GLOB_WILDCARD.split(glob)
+    pieces[0] = _BREAK + pieces[0]
+    pieces[-1] += _BREAK
+    return [piece for piece in pieces if piece.strip(_BREAK)]
+
+
+def _regex_skeleton(compiled):
+    """Runs of literal characters every match of compiled contains, with
+    _BREAK for anchors and classes of non-word characters only.
+
+    Only the top level of the parsed pattern is looked at, where each
+    literal is required. Case-insensitive patterns get none, so they are
+    run for every URL.
+    """
+    if compiled.flags & re.IGNORECASE:
+        return []
+    pieces = [""]
+    for op, value in sre_parse.parse(compiled.pattern):
+        if op is sre_constants.LITERAL:
+            pieces[-1] += chr(value)
+        elif (op is sre_constants.AT and value in _WORD_EDGES) or (
+            op is sre_constants.IN
+            and all(
+                kind is sre_constants.LITERAL and not _TOKEN.match(chr(char))
+                for kind, char in value
+            )
+        ):
+            pieces[-1] += _BREAK
+        else:
+            pieces.append("")
+    return [piece for piece in pieces if piece.strip(_BREAK)]
+
+
+class UrlScope:
+    """Include and exclude rules for links.
+
+    A URL is in scope unless an exclude rule matches it; when there are
+    include rules, one of them must match as well. Raises ValueError for
+    an invalid rule.
+    """
+
+    def __init__(self, include=(), exclude=()):
+        self.include = RuleSet(include)
+        self.exclude = RuleSet(exclude)
+        self.dropped = 0
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    def allows(self, url):
+        """True if url is in scope; otherwise counts it as dropped."""
+        if (self.exclude and self.exclude.matches(url)) or (
+            self.include and not self.include.matches(url)
+        ):
+            self.dropped += 1
+            return False
+        return True
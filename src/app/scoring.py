@@ -0,0 +1,87 @@
+# scoring.py
+"""Link scores for best-first crawling.
+
+A score function is any callable f(url, anchor, inlinks) -> float, where
+anchor is the text of the link that found url and inlinks the number of
+links to it seen so far. LinkScorer adds up weighted score functions and
+subtracts a penalty per level of depth; frontier.PriorityFrontier crawls
+the highest-scoring URL first. With every weight at 0 the depth penalty
+alone orders the crawl, which is breadth-first again.
+"""
+
+import math
+import re
+from urllib.parse import urlsplit
+
+CRAWL_ORDERS = ("breadth-first", "best-first")
+
+
+def parse_patterns(text):
+    """Parses whitespace-separated "regex=weight" entries.
+
+    Returns [(compiled regex, weight)]. Raises ValueError for an entry
+    without a numeric weight or with an invalid regex.
+    """
+    patterns = []
+    for entry in text.split():
+        pattern, _, weight = entry.rpartition("=")
+        try:
+            patterns.append((re.compile(pattern), float(weight)))
+        except (re.error, ValueError) as e:
+            raise ValueError(f"bad pattern {entry!r}: {e}") from e
+    return patterns
+
+
+class UrlPatternScore:
+    """Sum of the weights of the patterns found in the URL; weights can be
+    negative to push sections back."""
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+
+    def __call__(self, url, anchor, inlinks):
+        return sum(weight for pattern, weight in self.patterns if pattern.search(url))
+
+
+class KeywordScore:
+    """Number of keywords found in the anchor text or the URL."""
+
+    def __init__(self, keywords):
+        self.keywords = [k.strip().lower() for k in keywords if k.strip()]
+
+    def __call__(self, url, anchor, inlinks):
+        text = f"{anchor} {url}".lower()
+        return sum(1 for keyword in self.keywords if keyword in text)
+
+
+def inlink_score(url, anchor, inlinks):
+    """log2(1 + inlinks), so the first few links to a page count most."""
+    return math.log2(1 + inlinks)
+
+
+class HostAffinityScore:
+    """1 for the start URL's site (its host or a subdomain), 0 elsewhere."""
+
+    def __init__(self, start_url):
+        host = (urlsplit(start_url).hostname or "").lower()
+        self.site = host[4:] if host.startswith("www.") else host
+
+    def __call__(self, url, anchor, inlinks):
+        host = urlsplit(url).hostname or ""
+        return 1.0 if host == self.site or host.endswith("." + self.site) else 0.0
+
+
+class LinkScorer:
+    """Weighted sum of score functions, minus depth_penalty per level."""
+
+    def __init__(self, scores=(), depth_penalty=1.0):
+        # (score function, weight), weights of 0 left out
+        self.scores = [(score, weight) for score, weight in scores if weight]
+        self.depth_penalty = depth_penalty
+
+    def score(self, url, depth, anchor="", inlinks=1):
+        """Higher scores are crawled sooner."""
+        total = -self.depth_penalty * depth
+        for score, weight in self.scores:
+            total += weight * score(url, anchor, inlinks)
+        return total
@@ -1,14 +1,119 @@
 # scraper_core.py
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 import os
 import json
-import csv
+import hashlib
 import threading
 import collections
+import multiprocessing
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    FIRST_COMPLETED,
+    wait,
+)
 from datetime import datetime
-import queue
+import sqlite3
+
+from assets import MEDIA_LAYOUTS, AssetRegistry, ContentStore
+from budget import CrawlBudget
+from charset import decode_html, sniff_encoding
+from checkpoint import CrawlCheckpoint
+from dnscache import DnsCache
+from extract import PARSERS, extract_html
+from frontier import Frontier, PriorityFrontier
+from gating import ResourceRejected, check_response, read_body
+from linkgraph import LinkGraph
+from recrawl import RecrawlCache, conditional_headers, content_hash
+from scoring import (
+    CRAWL_ORDERS,
+    HostAffinityScore,
+    KeywordScore,
+    LinkScorer,
+    UrlPatternScore,
+    inlink_score,
+    parse_patterns,
+)
+from scope import UrlScope
+from search import SearchIndex
+from simhash import NearDuplicateIndex, simhash
+from sinks import COMPRESSIONS, CsvSink, JsonLinesSink, SqliteSink
+import transfer
+from transport import Transport
+from urlcanon import TrapDetector, canonicalize_links, canonicalize_url
+
+# Trap URLs logged one by one; the rest are only counted
+TRAP_LOG_LINES = 20
+
+# Engine settings shown on the UI "Engine" tab; merged under the UI options.
+ENGINE_SETTINGS = {
+    "Concurrent crawling": True,
+    "Max concurrent requests": 8,
+    "Max requests per host": 2,
+    "Max concurrent downloads": 4,
+    "Skip duplicate media downloads": True,
+    "Media storage layout": "flat",
+    "Resumable video downloads": True,
+    "Video download segments": 1,
+    "Max page size (MB, 0 = no limit)": 10,
+    "Max image size (MB, 0 = no limit)": 25,
+    "Max video size (MB, 0 = no limit)": 4096,
+    "Max depth": 3,
+    "Max pages (0 = no limit)": 0,
+    "Max MB downloaded (0 = no limit)": 0,
+    "Max crawl minutes (0 = no limit)": 0,
+    "Max depth per host (0 = no limit)": 0,
+    "Max pages per host (0 = no limit)": 0,
+    "Max MB per host (0 = no limit)": 0,
+    "Max minutes per host (0 = no limit)": 0,
+    "HTTP retries": 3,
+    "Retry backoff (ms)": 500,
+    "Circuit breaker failures (0 = off)": 5,
+    "Circuit breaker cooldown (seconds)": 60,
+    "DNS cache TTL (seconds, 0 = off)": 300,
+    "DNS failure cache TTL (seconds)": 60,
+    "Prefetch DNS for queued hosts": True,
+    "Include URLs matching (space separated rules)": "",
+    "Exclude URLs matching (space separated rules)": "",
+    "Canonicalize URLs": True,
+    "Strip tracking and session parameters": True,
+    "Detect crawler traps": True,
+    "Max URLs per URL pattern (0 = no limit)": 0,
+    "Detect near-duplicate pages": False,
+    "Near-duplicate max bit distance": 6,
+    "Skip links on near-duplicate pages": True,
+    "Crawl order": "breadth-first",
+    "Priority keywords (comma separated)": "",
+    "Priority URL patterns (regex=weight, space separated)": "",
+    "Keyword weight": 10,
+    "Inlink weight": 2,
+    "Same-site weight": 5,
+    "Depth penalty": 1,
+    "HTML parser": "lxml-raw",
+    "Parse in worker processes": False,
+    "Parser processes (0 = all cores)": 0,
+    "Save crawl checkpoints": True,
+    "Resume previous crawl": False,
+    "Checkpoint interval (seconds)": 10,
+    "Incremental re-crawl": False,
+    "Save as JSON Lines": True,
+    "JSON Lines compression": "none",
+    "Save to SQLite database": False,
+    "Build full-text search index": False,
+    "Build link graph": False,
+}
+
+# Queued image/video downloads allowed per download thread before page
+# workers wait for the download pool to catch up
+DOWNLOAD_BACKLOG = 32
+
+# Settings the UI offers as a fixed list of choices
+ENGINE_CHOICES = {
+    "Crawl order": CRAWL_ORDERS,
+    "HTML parser": PARSERS,
+    "JSON Lines compression": COMPRESSIONS,
+    "Media storage layout": MEDIA_LAYOUTS,
+}
 
 
 class ScraperCore(threading.Thread):
@@ -27,11 +132,36 @@ class ScraperCore(threading.Thread):
         self.base_path = base_path
         self.images_path = images_path
         self.videos_path = videos_path
-        self.options = options
+        self.options = {**ENGINE_SETTINGS, **options}
         self.log_queue = log_queue
         self.stop_event = stop_event
         self.error_logs = []
-        self.max_depth = 3
+        # Depth, page, byte and time limits, checked before a URL is queued
+        self.budget = None
+        self.checkpoint = None
+        self.cache = None
+        # Streaming result sinks; results/store are the JSONL/SQLite ones
+        self.sinks = []
+        self.results = None
+        self.store = None
+        self.graph = None
+        # Include/exclude rules and likely crawler traps, applied to links
+        # before they are queued
+        self.scope = None
+        self.start_netloc = None
+        self.traps = None
+        # SimHash fingerprints of the pages seen, for near-duplicates
+        self.near_dups = None
+        # Best-first crawling scores links by their anchor text
+        self.want_anchors = False
+        # Image/video downloads run on their own pool, fed by _finish_page()
+        self.download_pool = None
+        self.download_slots = None
+        self.assets = None
+        self.media_store = None
+        # Pooled session shared by page fetches and downloads
+        self.transport = None
+        self.dns = None
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
@@ -40,120 +170,660 @@ class ScraperCore(threading.Thread):
         """Main scraping method called when the thread starts."""
         self.log_queue.put(("log", f"Starting scrape on: {self.start_url}\n"))
 
-        to_visit = collections.deque([(self.start_url, 0)])
-        visited = set()
-        data = []
+        opts = self.options
+        if opts["Concurrent crawling"]:
+            max_workers = max(1, int(opts["Max concurrent requests"]))
+            per_host = max(1, int(opts["Max requests per host"]))
+        else:
+            max_workers = per_host = 1
 
-        while to_visit and not self.stop_event.is_set():
-            url, current_depth = to_visit.popleft()
-            if url in visited or current_depth > self.max_depth:
-                continue
-            visited.add(url)
-            self.log_queue.put(("log", f"Scraping {url} (depth {current_depth})...\n"))
+        self._open_transport(max_workers)
+        self._open_budget()
+        if opts["Detect near-duplicate pages"]:
+            if opts["Extract text content"]:
+                self.near_dups = NearDuplicateIndex(
+                    max(0, int(opts["Near-duplicate max bit distance"]))
+                )
+            else:
+                self.log_queue.put(
+                    (
+                        "log",
+                        "Skipping near-duplicate detection: text extraction is off\n",
+                    )
+                )
+        self._open_scope()
+        if opts["Detect crawler traps"]:
+            self.traps = TrapDetector(
+                max(0, int(opts["Max URLs per URL pattern (0 = no limit)"]))
+            )
+        to_visit = self._open_frontier()
+        finished = self._open_checkpoint(to_visit)
+        resumed = finished is not None
+        self._open_sinks(finished)
+        if opts["Incremental re-crawl"]:
+            self._open_cache()
+        if opts["Build link graph"]:
+            self._open_graph(resumed)
+        host_load = collections.Counter()
+        # future -> (stage, url, depth, host, validators);
+        # stages: fetch, parse, finish
+        in_flight = {}
+        fetching = parsing = 0
 
-            try:
-                resp = requests.get(url, timeout=15, headers=self.headers)
-                resp.raise_for_status()
-                soup = BeautifulSoup(resp.text, "html.parser")
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._start_download_pool()
+        parse_pool, parse_limit = self._start_parse_pool()
+        while not self.stop_event.is_set():
+            # Keep the pool full with URLs whose host still has a free slot.
+            # In pipeline mode, stop fetching while the parsers are backed up.
+            while fetching < max_workers and parsing < parse_limit:
+                item = to_visit.pop(lambda host: host_load[host] < per_host)
+                if item is None:
+                    break
+                url, current_depth = item
+                # Time and byte budgets can run out while a URL waits
+                if current_depth > self.budget.max_depth or not self.budget.allows(url):
+                    continue
+                host = urlparse(url).netloc
+                host_load[host] += 1
+                fetching += 1
+                self.log_queue.put(
+                    ("log", f"Scraping {url} (depth {current_depth})...\n")
+                )
+                task = self._fetch_page if parse_pool else self._scrape_page
+                future = pool.submit(task, url)
+                in_flight[future] = ("fetch", url, current_depth, host, None)
+
+            if not in_flight:
+                break
 
-                page_data = {"url": url}
-                self._extract_data(soup, url, page_data)
+            done, _ = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, url, current_depth, host, validators = in_flight.pop(future)
+                if stage == "fetch":
+                    fetching -= 1
+                    host_load[host] -= 1
+                elif stage == "parse":
+                    parsing -= 1
+                try:
+                    result = future.result()
+                except ResourceRejected as e:
+                    self.log_queue.put(("log", f"Skipping {url}: {str(e)}\n"))
+                    if self.checkpoint:
+                        self.checkpoint.finished(url)
+                    continue
+                except Exception as e:
+                    error_msg = f"Error scraping {url}: {str(e)}"
+                    self.log_queue.put(("log", error_msg + "\n"))
+                    if self.checkpoint:
+                        self.checkpoint.finished(url)
+                    if self.store:
+                        self.store.write_error(url, str(e))
+                    continue
 
-                # Save Raw HTML (if selected)
-                if self.options["Save raw HTML"]:
-                    self._save_raw_html(resp.text, url)
+                if stage == "fetch" and parse_pool:
+                    body, encoding, features, validators = result
+                    if features is None:
+                        # Fetched HTML goes to a parser process
+                        future = parse_pool.submit(
+                            extract_html,
+                            body,
+                            url,
+                            opts["HTML parser"],
+                            opts["Extract text content"],
+                            encoding,
+                            self.want_anchors,
+                        )
+                        in_flight[future] = (
+                            "parse",
+                            url,
+                            current_depth,
+                            host,
+                            validators,
+                        )
+                        parsing += 1
+                        continue
+                    result = features
+                    stage = "parse"
+                if stage == "parse":
+                    # Downloads stay on threads, off the coordinator
+                    future = pool.submit(self._finish_page, url, result, validators)
+                    in_flight[future] = (
+                        "finish",
+                        url,
+                        current_depth,
+                        host,
+                        validators,
+                    )
+                    continue
+
+                page_data, links, fingerprint, anchors = result
+                duplicate_of = None
+                if fingerprint is not None:
+                    duplicate_of = self.near_dups.check(url, fingerprint)
+                    if duplicate_of:
+                        page_data["near_duplicate_of"] = duplicate_of
+                        self.log_queue.put(
+                            ("log", f"Near-duplicate of {duplicate_of}: {url}\n")
+                        )
+                for sink in self.sinks:
+                    sink.write(page_data, current_depth)
+                if self.graph is not None:
+                    self.graph.add_page(url, current_depth, [link for link, _ in links])
 
-                data.append(page_data)
+                # Process links for recursion; a near-duplicate's links are
+                # those of the page it copies
+                if not (duplicate_of and opts["Skip links on near-duplicate pages"]):
+                    self._process_links(links, to_visit, current_depth, anchors)
+                if self.checkpoint:
+                    self.checkpoint.finished(url)
 
-                # Process links for recursion
-                self._process_links(soup, url, to_visit, current_depth, self.start_url)
+            if self.checkpoint and self.checkpoint.due():
+                # Results first, so a checkpointed page is never missing
+                for sink in self.sinks:
+                    sink.flush()
+                self.checkpoint.flush()
+            if self.budget.due():
+                summary = self.budget.summary()
+                if summary:
+                    self.log_queue.put(("log", summary + ".\n"))
 
-            except requests.exceptions.RequestException as e:
-                error_msg = f"Error scraping {url}: {str(e)}"
-                self.log_queue.put(("log", error_msg + "\n"))
+        pool.shutdown(wait=True, cancel_futures=True)
+        if parse_pool:
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+        # Queued downloads are dropped when stopped, finished otherwise
+        self.download_pool.shutdown(wait=True, cancel_futures=self.stop_event.is_set())
+        self._close_assets()
+        self.log_queue.put(("log", self.transport.summary() + ".\n"))
+        self.transport.close()
+        if self.dns:
+            self.log_queue.put(("log", self.dns.summary() + ".\n"))
+            self.dns.close()
+        if self.near_dups is not None and self.near_dups.duplicates:
+            self.log_queue.put(
+                (
+                    "log",
+                    f"Found {self.near_dups.duplicates} near-duplicate pages.\n",
+                )
+            )
+        if self.scope and self.scope.dropped:
+            self.log_queue.put(
+                ("log", f"Dropped {self.scope.dropped} out-of-scope URLs.\n")
+            )
+        if self.traps and self.traps.dropped:
+            self.log_queue.put(
+                ("log", f"Dropped {self.traps.dropped} likely crawler trap links.\n")
+            )
+        summary = self.budget.summary()
+        if summary:
+            self.log_queue.put(("log", summary + ".\n"))
+        if self.cache:
+            self.cache.close()
+        self._close_sinks()
+        if self.checkpoint:
+            # After the sinks, which hold the results of its finished pages
+            self.checkpoint.close()
+        if self.graph is not None:
+            # Saved even when stopped, so a resumed crawl can extend it
+            self._save_graph()
 
-        # Final saving steps
-        if data and not self.stop_event.is_set():
+        # Final saving steps, built from the streamed JSON Lines results
+        has_results = self.results and (self.results.count or resumed)
+        if has_results and not self.stop_event.is_set():
             if self.options["Save as JSON"]:
-                self._save_json(data)
-            if self.options["Save as CSV"]:
-                self._save_csv(data)
+                self._save_json(self.results.records())
+            if not self.options["Save as JSON Lines"]:
+                os.remove(self.results.path)
 
         self.log_queue.put(("log", "Scraping completed.\n"))
         self.log_queue.put(("done",))
 
-    def _extract_data(self, soup, url, page_data):
-        """Handles metadata, text, links, and file downloading."""
+    def _open_transport(self, max_workers):
+        """Creates the shared session, pooling enough connections per host
+        for every page worker, download thread and video segment, and the
+        DNS cache its connections resolve through."""
         opts = self.options
+        downloads = max(1, int(opts["Max concurrent downloads"]))
+        segments = max(1, int(opts["Video download segments"]))
+        ttl = int(opts["DNS cache TTL (seconds, 0 = off)"])
+        if ttl > 0:
+            self.dns = DnsCache(
+                ttl,
+                max(0, int(opts["DNS failure cache TTL (seconds)"])),
+                prefetch=opts["Prefetch DNS for queued hosts"],
+            )
+        self.transport = Transport(
+            self.headers,
+            pool_size=max_workers + downloads * segments,
+            retries=max(0, int(opts["HTTP retries"])),
+            backoff=max(0, int(opts["Retry backoff (ms)"])) / 1000,
+            breaker_failures=max(0, int(opts["Circuit breaker failures (0 = off)"])),
+            breaker_cooldown=max(0, int(opts["Circuit breaker cooldown (seconds)"])),
+            stop_event=self.stop_event,
+            resolver=self.dns,
+        )
 
-        # Metadata
-        if opts["Extract metadata (title, description, keywords)"]:
+    def _open_budget(self):
+        """Creates the crawl budget from the engine settings; sizes are
+        given in MB and times in minutes."""
+        opts = self.options
+
+        def limit(name, scale=1):
+            return max(0, int(opts[name])) * scale
+
+        self.budget = CrawlBudget(
+            max_depth=limit("Max depth"),
+            max_pages=limit("Max pages (0 = no limit)"),
+            max_bytes=limit("Max MB downloaded (0 = no limit)", 1024 * 1024),
+            max_seconds=limit("Max crawl minutes (0 = no limit)", 60),
+            host_depth=limit("Max depth per host (0 = no limit)"),
+            host_pages=limit("Max pages per host (0 = no limit)"),
+            host_bytes=limit("Max MB per host (0 = no limit)", 1024 * 1024),
+            host_seconds=limit("Max minutes per host (0 = no limit)", 60),
+            log=lambda message: self.log_queue.put(("log", message + "\n")),
+        )
+
+    def _open_scope(self):
+        """Compiles the include/exclude rules, if any. Internal links are
+        those on the start URL's host."""
+        opts = self.options
+        self.start_netloc = urlparse(self._canonical(self.start_url)).netloc
+        include = opts["Include URLs matching (space separated rules)"].split()
+        exclude = opts["Exclude URLs matching (space separated rules)"].split()
+        if not (include or exclude):
+            return
+        try:
+            self.scope = UrlScope(include, exclude)
+        except ValueError as e:
+            self.log_queue.put(("log", f"Error in URL scope rules: {str(e)}\n"))
+
+    def _open_frontier(self):
+        """A FIFO frontier for breadth-first crawls, otherwise one ordered by
+        the link scores set up in the engine settings."""
+        opts = self.options
+        if opts["Crawl order"] == "breadth-first":
+            return Frontier()
+
+        try:
+            patterns = parse_patterns(
+                opts["Priority URL patterns (regex=weight, space separated)"]
+            )
+        except ValueError as e:
+            self.log_queue.put(("log", f"Error in priority URL patterns: {str(e)}\n"))
+            patterns = []
+        keywords = opts["Priority keywords (comma separated)"].split(",")
+        keyword_score = KeywordScore(keywords)
+        keyword_weight = int(opts["Keyword weight"]) if keyword_score.keywords else 0
+        self.want_anchors = bool(keyword_weight)
+        scorer = LinkScorer(
+            [
+                (UrlPatternScore(patterns), 1 if patterns else 0),
+                (keyword_score, keyword_weight),
+                (inlink_score, int(opts["Inlink weight"])),
+                (HostAffinityScore(self.start_url), int(opts["Same-site weight"])),
+            ],
+            depth_penalty=int(opts["Depth penalty"]),
+        )
+        return PriorityFrontier(scorer)
+
+    def _open_checkpoint(self, to_visit):
+        """Seeds the frontier, replaying the checkpoint journal if resuming.
+
+        Returns the URLs an earlier crawl finished if it is being resumed,
+        otherwise None.
+        """
+        opts = self.options
+        start_url = self._canonical(self.start_url)
+        if not opts["Save crawl checkpoints"]:
+            self.budget.charge(start_url, 0)
+            to_visit.push(start_url, 0)
+            return None
+
+        self.checkpoint = CrawlCheckpoint(
+            self.base_path, int(opts["Checkpoint interval (seconds)"])
+        )
+        state = None
+        if opts["Resume previous crawl"]:
             try:
-                title = (
-                    soup.find("title").string.strip()
-                    if soup.find("title") and soup.find("title").string
-                    else ""
+                state = self.checkpoint.load(self.start_url)
+            except OSError as e:
+                self.log_queue.put(("log", f"Error reading checkpoint: {str(e)}\n"))
+            if state is None:
+                self.log_queue.put(
+                    ("log", "No checkpoint for this URL, starting a new crawl.\n")
                 )
-                desc_tag = soup.find("meta", attrs={"name": "description"})
-                desc = (
-                    desc_tag["content"].strip()
-                    if desc_tag and desc_tag.get("content")
-                    else ""
+
+        try:
+            self.checkpoint.open(self.start_url, resume=state is not None)
+        except OSError as e:
+            self.log_queue.put(("log", f"Error opening checkpoint: {str(e)}\n"))
+            self.checkpoint = None
+            state = None
+
+        if state is None:
+            self.budget.charge(start_url, 0)
+            to_visit.push(start_url, 0)
+            if self.checkpoint:
+                self.checkpoint.queued(start_url, 0)
+                # Nothing is finished yet, so this can go to disk right away
+                self.checkpoint.flush()
+            return None
+
+        queued, finished = state
+        for url, depth in queued:
+            # Pages queued before count against this run's budget too
+            self.budget.charge(url, depth)
+            if url in finished:
+                to_visit.mark_seen(url)
+            else:
+                to_visit.push(url, depth)
+        self.log_queue.put(
+            (
+                "log",
+                f"Resuming crawl: {len(finished)} pages done, "
+                f"{len(to_visit)} queued.\n",
+            )
+        )
+        return finished
+
+    def _open_sinks(self, finished):
+        """Opens the streaming result files; data.json is built from the JSONL.
+
+        A resumed crawl (finished is not None) appends to the results of the
+        interrupted one.
+        """
+        opts = self.options
+        try:
+            if opts["Save as JSON Lines"] or opts["Save as JSON"]:
+                self.results = JsonLinesSink(
+                    self.base_path,
+                    opts["JSON Lines compression"],
+                    append=finished is not None,
                 )
-                keys_tag = soup.find("meta", attrs={"name": "keywords"})
-                keys = (
-                    keys_tag["content"].strip()
-                    if keys_tag and keys_tag.get("content")
-                    else ""
+                self.sinks.append(self.results)
+            if opts["Save as CSV"]:
+                self.sinks.append(CsvSink(self.base_path, finished))
+            if opts["Save to SQLite database"]:
+                self.store = SqliteSink(self.base_path)
+                self.sinks.append(self.store)
+            if opts["Build full-text search index"]:
+                if not opts["Extract text content"]:
+                    self.log_queue.put(
+                        ("log", "Skipping search index: text extraction is off\n")
+                    )
+                else:
+                    self.sinks.append(SearchIndex(self.base_path))
+        except (OSError, RuntimeError, sqlite3.Error) as e:
+            self.log_queue.put(("log", f"Error opening results file: {str(e)}\n"))
+
+    def _close_sinks(self):
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except (OSError, sqlite3.Error) as e:
+                self.log_queue.put(
+                    ("log", f"Error saving {os.path.basename(sink.path)}: {str(e)}\n")
                 )
-                page_data.update(
-                    {"title": title, "description": desc, "keywords": keys}
+                continue
+            if isinstance(sink, CsvSink):
+                self.log_queue.put(("log", "Saved CSV to data.csv\n"))
+                self.log_queue.put(("inc_count", 1))
+            elif isinstance(sink, SqliteSink):
+                self.log_queue.put(("log", "Saved database to data.sqlite\n"))
+                self.log_queue.put(("inc_count", 1))
+            elif isinstance(sink, SearchIndex):
+                self.log_queue.put(("log", "Saved search index to search.sqlite\n"))
+                self.log_queue.put(("inc_count", 1))
+
+    def _open_cache(self):
+        try:
+            self.cache = RecrawlCache(self.base_path)
+        except sqlite3.Error as e:
+            self.log_queue.put(("log", f"Error opening re-crawl cache: {str(e)}\n"))
+
+    def _open_graph(self, resumed):
+        self.graph = LinkGraph(self.base_path)
+        if not resumed:
+            return
+        try:
+            if self.graph.load():
+                self.log_queue.put(
+                    (
+                        "log",
+                        f"Loaded link graph: {len(self.graph)} pages, "
+                        f"{self.graph.edge_count} links.\n",
+                    )
                 )
-            except Exception as e:
+        except (OSError, ValueError, KeyError) as e:
+            self.log_queue.put(("log", f"Error loading link graph: {str(e)}\n"))
+            self.graph = LinkGraph(self.base_path)
+
+    def _save_graph(self):
+        """Saves the link graph with PageRank, in-degree and orphan pages."""
+        try:
+            report = self.graph.save()
+            self.log_queue.put(
+                (
+                    "log",
+                    f"Saved link graph to {LinkGraph.RANKS_FILE} "
+                    f"({report['nodes']} pages, {report['edges']} links, "
+                    f"{len(report['orphan_pages'])} orphans)\n",
+                )
+            )
+            self.log_queue.put(("inc_count", 1))
+        except Exception as e:
+            self.log_queue.put(("log", f"Error saving link graph: {str(e)}\n"))
+
+    def _start_download_pool(self):
+        opts = self.options
+        if opts["Concurrent crawling"]:
+            workers = max(1, int(opts["Max concurrent downloads"]))
+        else:
+            workers = 1
+        self.download_pool = ThreadPoolExecutor(max_workers=workers)
+        self.download_slots = threading.BoundedSemaphore(workers * DOWNLOAD_BACKLOG)
+        if opts["Skip duplicate media downloads"]:
+            try:
+                # Incremental re-crawls revalidate earlier downloads instead
+                self.assets = AssetRegistry(
+                    self.base_path, skip_previous=not opts["Incremental re-crawl"]
+                )
+            except OSError as e:
+                self.log_queue.put(("log", f"Error opening asset registry: {str(e)}\n"))
+        if opts["Media storage layout"] == "content-addressed":
+            try:
+                self.media_store = ContentStore(self.base_path)
+            except OSError as e:
+                self.log_queue.put(("log", f"Error opening media manifest: {str(e)}\n"))
+
+    def _close_assets(self):
+        for registry in (self.assets, self.media_store):
+            if registry is None:
+                continue
+            try:
+                registry.close()
+            except OSError as e:
                 self.log_queue.put(
-                    ("log", f"Error extracting metadata from {url}: {str(e)}\n")
+                    (
+                        "log",
+                        f"Error saving {os.path.basename(registry.path)}: {str(e)}\n",
+                    )
+                )
+        if self.assets and self.assets.skipped:
+            self.log_queue.put(
+                (
+                    "log",
+                    f"Skipped {self.assets.skipped} already downloaded media files\n",
                 )
+            )
+
+    def _queue_download(self, file_url, save_path, file_type, page_url):
+        """Hands a download to the download pool. Runs on a page worker.
+
+        Blocks while the pool's backlog is full, so a media-heavy site slows
+        page fetching instead of queueing downloads without bound. Assets
+        already claimed by another page are skipped here, before any request.
+        """
+        if self.assets and not self.assets.claim(file_url):
+            return
+        while not self.download_slots.acquire(timeout=0.5):
+            if self.stop_event.is_set():
+                return
+        try:
+            future = self.download_pool.submit(
+                self.download_file, file_url, save_path, file_type, page_url
+            )
+        except RuntimeError:
+            # The pool was shut down by a stopped crawl
+            self.download_slots.release()
+            if self.assets:
+                self.assets.release(file_url)
+            return
+        future.add_done_callback(lambda _: self.download_slots.release())
+
+    def _start_parse_pool(self):
+        """Returns (process pool, max queued parses), or (None, inf) if off."""
+        opts = self.options
+        if not opts["Parse in worker processes"]:
+            return None, float("inf")
+        processes = int(opts["Parser processes (0 = all cores)"])
+        processes = processes if processes > 0 else os.cpu_count() or 1
+        # "spawn" avoids forking a process that already runs Tk and threads
+        pool = ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.log_queue.put(("log", f"Parsing pages in {processes} processes\n"))
+        return pool, processes * 2
+
+    def _scrape_page(self, url):
+        """Fetches and extracts a single page. Runs on a worker thread."""
+        body, encoding, features, validators = self._fetch_page(url)
+        opts = self.options
+        if features is None:
+            features = extract_html(
+                body,
+                url,
+                opts["HTML parser"],
+                opts["Extract text content"],
+                encoding,
+                self.want_anchors,
+            )
+        return self._finish_page(url, features, validators)
+
+    def _fetch_page(self, url):
+        """Downloads a page. Runs on a worker thread.
+
+        Returns (body, encoding, features, validators), with body as bytes
+        for extract_html(). In incremental mode, features holds the
+        previous extraction when the page is unchanged (body is then None),
+        and validators is (etag, last_modified, hash) to store.
+        """
+        want_text = self.options["Extract text content"]
+        cached = self.cache.get_page(url, want_text) if self.cache else None
+        # Streamed, so a non-HTML or oversized response is dropped after
+        # its headers instead of being downloaded and parsed
+        with self.transport.get(
+            url,
+            timeout=15,
+            headers=conditional_headers(self.headers, cached),
+            stream=True,
+        ) as resp:
+            resp.raise_for_status()
+
+            if resp.status_code == 304 and cached:
+                self.log_queue.put(("log", f"Not modified, reusing {url}\n"))
+                return None, None, cached[3], None
+
+            max_bytes = self._byte_cap("page")
+            check_response(resp, "page", max_bytes)
+            body = read_body(resp, max_bytes)
+        self.budget.add_bytes(url, len(body))
+
+        validators = None
+        if self.cache:
+            validators = (
+                resp.headers.get("ETag"),
+                resp.headers.get("Last-Modified"),
+                content_hash(body),
+            )
+            if cached and cached[2] == validators[2]:
+                self.log_queue.put(("log", f"Unchanged content, reusing {url}\n"))
+                return None, None, cached[3], validators
+
+        # Sniffed from the first few KB; the parser decodes the bytes itself
+        encoding, _ = sniff_encoding(body, resp.headers.get("Content-Type"))
+
+        # Save Raw HTML (if selected)
+        if self.options["Save raw HTML"]:
+            self._save_raw_html(decode_html(body, encoding), url)
+
+        return body, encoding, None, validators
+
+    def _byte_cap(self, kind):
+        """Size limit in bytes for a page, image or video; None if unlimited."""
+        megabytes = int(self.options[f"Max {kind} size (MB, 0 = no limit)"])
+        return megabytes * 1024 * 1024 if megabytes > 0 else None
+
+    def _finish_page(self, url, features, validators=None):
+        """Keeps the selected features and queues media. Runs on a thread.
+
+        Returns (page_data, links, fingerprint, anchors) where links are
+        (link, netloc) pairs used for recursion, fingerprint is the SimHash
+        of the text, or None when near-duplicates aren't looked for, and
+        anchors maps links to their anchor text for best-first scoring.
+        """
+        opts = self.options
+        page_data = {"url": url}
+
+        if validators and self.cache:
+            self.cache.store_page(
+                url, *validators, features, opts["Extract text content"]
+            )
+
+        # Metadata
+        if opts["Extract metadata (title, description, keywords)"]:
+            page_data.update(
+                {
+                    "title": features["title"],
+                    "description": features["description"],
+                    "keywords": features["keywords"],
+                }
+            )
 
         # Text Content
         if opts["Extract text content"]:
-            try:
-                for script_or_style in soup(["script", "style"]):
-                    script_or_style.extract()
-                page_data["text"] = soup.get_text(separator="\n", strip=True)
-            except Exception:
-                page_data["text"] = ""
+            page_data["text"] = features["text"]
 
         # Links (used for recursion and CSV/JSON output)
-        links = []
-        try:
-            links = [
-                urljoin(url, a["href"])
-                for a in soup.find_all("a", href=True)
-                if urlparse(urljoin(url, a["href"])).scheme in ("http", "https")
-            ]
-            if opts["Extract all URLs from <a> tags"]:
-                page_data["links"] = links
-        except Exception:
-            pass
+        links = features["links"]
+        if opts["Extract all URLs from <a> tags"]:
+            page_data["links"] = [link for link, _ in links]
+        # Pages from the re-crawl cache may have been parsed without anchors
+        anchors = features.get("anchors") or {}
+        if opts["Canonicalize URLs"]:
+            # Here on the worker thread rather than on the coordinator
+            strip = opts["Strip tracking and session parameters"]
+            links = canonicalize_links(links, strip)
+            canonical = {}
+            for link, text in anchors.items():
+                canonical.setdefault(canonicalize_url(link, strip), text)
+            anchors = canonical
 
         # Images
         if opts["Download all images from <img> tags"]:
-            for img in soup.find_all("img", src=True):
-                self.download_file(urljoin(url, img["src"]), self.images_path, "image")
+            for img_url in features["images"]:
+                self._queue_download(img_url, self.images_path, "image", url)
 
         # Videos
         if opts["Download all videos from <video> tags"]:
-            for video in soup.find_all("video"):
-                sources = video.find_all("source", src=True)
-                if sources:
-                    for source in sources:
-                        self.download_file(
-                            urljoin(url, source["src"]), self.videos_path, "video"
-                        )
-                elif video.get("src"):
-                    self.download_file(
-                        urljoin(url, video["src"]), self.videos_path, "video"
-                    )
+            for video_url in features["videos"]:
+                self._queue_download(video_url, self.videos_path, "video", url)
+
+        fingerprint = None
+        if self.near_dups is not None:
+            fingerprint = simhash(features["text"])
+
+        return page_data, links, fingerprint, anchors
 
     def _save_raw_html(self, html_content, url):
         """Saves the raw HTML content of the page."""
@@ -170,7 +840,7 @@ class ScraperCore(threading.Thread):
         except OSError as e:
             self.log_queue.put(("log", f"Error saving HTML for {url}: {str(e)}\n"))
 
-    def _process_links(self, soup, current_url, to_visit, current_depth, start_url):
+    def _process_links(self, links, to_visit, current_depth, anchors):
         """Handles internal/external link processing for recursive scraping."""
         opts = self.options
         if not (
@@ -178,55 +848,83 @@ class ScraperCore(threading.Thread):
             or opts["Follow external links"]
         ):
             return
+        if current_depth >= self.budget.max_depth:
+            return
 
-        for a in soup.find_all("a", href=True):
-            link = urljoin(current_url, a["href"])
-            parsed_link = urlparse(link)
-
-            if parsed_link.scheme not in ("http", "https") or not parsed_link.netloc:
+        for link, netloc in links:
+            # Links arrive resolved and limited to http(s) by extract_page(),
+            # and canonical if that is on
+            if not netloc:
                 continue
 
-            is_internal = parsed_link.netloc == urlparse(start_url).netloc
+            is_internal = netloc == self.start_netloc
 
             if (is_internal and opts["Follow internal links (recursive scraping)"]) or (
                 not is_internal and opts["Follow external links"]
             ):
-                if link not in to_visit and current_depth + 1 <= self.max_depth:
-                    to_visit.append((link, current_depth + 1))
+                if link in to_visit:
+                    # Best-first raises the score of a URL linked again
+                    to_visit.add_inlink(link, anchors.get(link, ""))
+                    continue
+                if self.scope and not self.scope.allows(link):
+                    # The rules don't change, so it needn't be checked again
+                    to_visit.mark_seen(link)
+                    continue
+                if self.traps:
+                    reason = self.traps.check(link)
+                    if reason:
+                        # Not marked seen: a per-pattern cap depends on the
+                        # order links turn up in, and is no verdict on the URL
+                        self._log_trap(link, reason)
+                        continue
+                # Not marked seen, as it may be reached again at a lower depth
+                if not self.budget.admit(link, current_depth + 1):
+                    continue
+                to_visit.push(link, current_depth + 1, anchors.get(link, ""))
+                if self.checkpoint:
+                    self.checkpoint.queued(link, current_depth + 1)
+                if self.dns:
+                    # Resolved by the time the URL is fetched
+                    self.dns.prefetch(link)
+
+    def _log_trap(self, link, reason):
+        """Logs the first TRAP_LOG_LINES trap URLs; the rest are counted."""
+        dropped = self.traps.dropped
+        if dropped <= TRAP_LOG_LINES:
+            self.log_queue.put(("log", f"Skipping likely trap {link}: {reason}\n"))
+        if dropped == TRAP_LOG_LINES:
+            self.log_queue.put(("log", "Not logging further likely trap URLs.\n"))
+
+    def _canonical(self, url):
+        """url in canonical form, if that option is on."""
+        opts = self.options
+        if not opts["Canonicalize URLs"]:
+            return url
+        return canonicalize_url(url, opts["Strip tracking and session parameters"])
 
     def _save_json(self, data):
-        """Saves the extracted data to a JSON file."""
+        """Saves the extracted data to a JSON file.
+
+        data may be any iterable of pages; they are written one at a time in
+        the same layout json.dump(indent=4) produces.
+        """
         try:
             json_path = os.path.join(self.base_path, "data.json")
             with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
+                separator = "[\n"
+                for page_data in data:
+                    f.write(separator)
+                    f.write(
+                        "    " + json.dumps(page_data, indent=4).replace("\n", "\n    ")
+                    )
+                    separator = ",\n"
+                f.write("\n]" if separator == ",\n" else "[]")
             self.log_queue.put(("log", "Saved JSON to data.json\n"))
             self.log_queue.put(("inc_count", 1))
         except Exception as e:
             self.log_queue.put(("log", f"Error saving JSON: {str(e)}\n"))
 
-    def _save_csv(self, data):
-        """Saves the extracted data to a CSV file."""
-        try:
-            fields = set()
-            for d in data:
-                # Exclude list fields (like 'links') for cleaner CSV output
-                fields.update(k for k, v in d.items() if not isinstance(v, list))
-            fields = sorted(fields)
-            csv_path = os.path.join(self.base_path, "data.csv")
-            with open(csv_path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=fields)
-                writer.writeheader()
-                cleaned_data = [
-                    {k: v for k, v in row.items() if k in fields} for row in data
-                ]
-                writer.writerows(cleaned_data)
-            self.log_queue.put(("log", "Saved CSV to data.csv\n"))
-            self.log_queue.put(("inc_count", 1))
-        except Exception as e:
-            self.log_queue.put(("log", f"Error saving CSV: {str(e)}\n"))
-
-    def download_file(self, file_url, save_path, file_type):
+    def download_file(self, file_url, save_path, file_type, page_url=None):
         """Generic method to download a file (image or video)."""
         if self.stop_event.is_set():
             return
@@ -236,6 +934,7 @@ class ScraperCore(threading.Thread):
             "video": (".mp4", ".webm", ".ogg", ".mov", ".avi", ".mkv"),
         }
 
+        temp_path = None
         try:
             if not file_url or not any(
                 file_url.lower().endswith(ext)
@@ -245,12 +944,16 @@ class ScraperCore(threading.Thread):
                     ("log", f"Skipping invalid {file_type.upper()} URL: {file_url}\n")
                 )
                 return
+            if not self.budget.allows(file_url):
+                self.log_queue.put(
+                    ("log", f"Skipping {file_type} {file_url}: over crawl budget\n")
+                )
+                return
 
-            timeout = 10 if file_type == "video" else 5
-            resp = requests.get(
-                file_url, timeout=timeout, headers=self.headers, stream=True
-            )
-            resp.raise_for_status()
+            # Revalidate assets a previous crawl saved and that are still on disk
+            cached = self.cache.get_asset(file_url) if self.cache else None
+            if cached and not os.path.isfile(cached[3]):
+                cached = None
 
             url_path = urlparse(file_url).path
             filename = os.path.basename(url_path)
@@ -269,16 +972,153 @@ class ScraperCore(threading.Thread):
                 )
 
             full_path = os.path.join(save_path, filename)
+            timeout = 10 if file_type == "video" else 5
+            headers = conditional_headers(self.headers, cached)
+            if file_type == "video" and self.options["Resumable video downloads"]:
+                # A stopped or failed download continues from its .part file
+                part_path = os.path.join(
+                    save_path,
+                    hashlib.sha1(file_url.encode()).hexdigest()[:16] + ".part",
+                )
+                max_bytes = self._byte_cap(file_type)
+                # Set before downloading, so the handlers below see the part file
+                temp_path = part_path
+                result = transfer.download(
+                    file_url,
+                    part_path,
+                    headers,
+                    timeout,
+                    self.stop_event,
+                    max(1, int(self.options["Video download segments"])),
+                    check=lambda resp: check_response(resp, file_type, max_bytes),
+                    max_bytes=max_bytes,
+                    session=self.transport,
+                )
+            else:
+                if self.media_store:
+                    # Streamed to a temp file; the final name comes from its hash
+                    full_path = temp_path = self.media_store.temp_path(save_path)
+                result = self._stream_file(
+                    file_url, full_path, headers, timeout, file_type
+                )
 
-            with open(full_path, "wb") as f:
-                for chunk in resp.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            if result is None and cached:
+                if temp_path and not temp_path.endswith(".part"):
+                    # The content store's temp file, created before the request
+                    os.remove(temp_path)
+                self.log_queue.put(
+                    (
+                        "log",
+                        f"Not modified {file_type}: {os.path.basename(cached[3])}\n",
+                    )
+                )
+                if self.assets:
+                    self.assets.record(file_url, cached[3])
+                return
+            if result is None:
+                raise transfer.IntegrityError("304 Not Modified without a cached copy")
+            resp_headers, digest, size = result
+            self.budget.add_bytes(file_url, size)
+
+            is_new = True
+            if self.media_store:
+                full_path, is_new = self.media_store.add(
+                    temp_path,
+                    save_path,
+                    digest,
+                    os.path.splitext(filename)[1],
+                    file_url,
+                    page_url,
+                    size,
+                )
+                filename = os.path.relpath(full_path, save_path)
+            elif temp_path:
+                os.replace(temp_path, full_path)
+            temp_path = None
 
+            if self.store:
+                self.store.write_asset(file_url, page_url, file_type, full_path, size)
+
+            if self.assets:
+                self.assets.record(file_url, full_path)
+
+            if self.cache:
+                self.cache.store_asset(
+                    file_url,
+                    resp_headers.get("ETag"),
+                    resp_headers.get("Last-Modified"),
+                    digest,
+                    full_path,
+                )
+
+            if not is_new:
+                self.log_queue.put(
+                    ("log", f"Already stored {file_type}: {filename} ({file_url})\n")
+                )
+                return
             self.log_queue.put(("log", f"Downloaded {file_type}: {filename}\n"))
             self.log_queue.put(("inc_count", 1))
 
+        except ResourceRejected as e:
+            # Kept claimed, so other pages linking it skip it too
+            if temp_path and temp_path.endswith(".part"):
+                for path in (temp_path, temp_path + ".json"):
+                    if os.path.exists(path):
+                        os.remove(path)
+            self.log_queue.put(("log", f"Skipping {file_type} {file_url}: {str(e)}\n"))
+        except transfer.DownloadCancelled:
+            if self.assets:
+                self.assets.release(file_url)
+            if temp_path and temp_path.endswith(".part"):
+                self.log_queue.put(
+                    ("log", f"Paused {file_type}, will resume: {filename}\n")
+                )
+            else:
+                self.log_queue.put(("log", f"Cancelled {file_type}: {filename}\n"))
         except Exception as e:
+            if temp_path and not temp_path.endswith(".part"):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            if self.assets:
+                # Another page linking it may try again
+                self.assets.release(file_url)
             self.log_queue.put(
                 ("log", f"Error downloading {file_type} {file_url}: {str(e)}\n")
             )
+
+    def _stream_file(self, file_url, path, headers, timeout, file_type):
+        """Downloads file_url to path in one stream.
+
+        Returns (response headers, sha1 hex, size), or None on 304 Not
+        Modified. Raises transfer.DownloadCancelled when stopped and
+        ResourceRejected when the file is the wrong type or too big; path
+        is removed in both cases.
+        """
+        with self.transport.get(
+            file_url, timeout=timeout, headers=headers, stream=True
+        ) as resp:
+            resp.raise_for_status()
+            if resp.status_code == 304:
+                return None
+            max_bytes = self._byte_cap(file_type)
+            check_response(resp, file_type, max_bytes)
+
+            hasher = hashlib.sha1()
+            size = 0
+            try:
+                with open(path, "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=8192):
+                        if self.stop_event.is_set():
+                            raise transfer.DownloadCancelled()
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        if max_bytes and size > max_bytes:
+                            raise ResourceRejected(
+                                f"body is over the limit of {max_bytes} bytes"
+                            )
+            except (transfer.DownloadCancelled, ResourceRejected):
+                # Don't leave a truncated file behind
+                os.remove(path)
+                raise
+        return resp.headers, hasher.hexdigest(), size
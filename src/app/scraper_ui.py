@@ -11,7 +11,7 @@ from urllib.parse import urlparse
 import threading
 
 # Import the core logic
-from scraper_core import ScraperCore
+from scraper_core import ScraperCore, ENGINE_CHOICES, ENGINE_SETTINGS
 
 
 class ScraperApp(ttk.Window):
@@ -38,7 +38,7 @@ class ScraperApp(ttk.Window):
         x = (screen_width // 2) - (self.width // 2)
         y = (screen_height // 2) - (self.height // 2)
         self.geometry(f"{self.width}x{self.height}+{x}+{y}")
-        self.resizable(False, False)  # Keep it minimal and fixed
+        self.minsize(self.width, self.height)
 
     def build_ui(self):
         main_frame = ttk.Frame(self, padding=10)
@@ -49,14 +49,17 @@ class ScraperApp(ttk.Window):
 
         self.setup_tab = ttk.Frame(self.notebook, padding=15)
         self.options_tab = ttk.Frame(self.notebook, padding=15)
+        self.engine_tab = ttk.Frame(self.notebook, padding=15)
         self.status_tab = ttk.Frame(self.notebook, padding=15)
 
         self.notebook.add(self.setup_tab, text="🌐 Setup")
         self.notebook.add(self.options_tab, text="⚙️ Options")
+        self.notebook.add(self.engine_tab, text="🚀 Engine")
         self.notebook.add(self.status_tab, text="📊 Status")
 
         self.build_setup_tab()
         self.build_options_tab()
+        self.build_engine_tab()
         self.build_status_tab()
 
     def build_setup_tab(self):
@@ -163,6 +166,80 @@ class ScraperApp(ttk.Window):
             target_col = col1 if i < 5 else col2
             checkbutton.pack(in_=target_col, anchor="w", pady=3, padx=5)
 
+    def build_engine_tab(self):
+        # Widgets are generated from ENGINE_SETTINGS so new settings show up here
+        self.engine_settings = {}
+        outer = ttk.LabelFrame(self.engine_tab, text="Crawl Engine", padding=10)
+        outer.pack(fill="both", expand=True, pady=5)
+
+        # There are too many settings for one screen, so they scroll
+        canvas = tk.Canvas(outer, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(outer, orient=tk.VERTICAL, command=canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        canvas.configure(yscrollcommand=scrollbar.set)
+
+        engine_frame = ttk.Frame(canvas)
+        window = canvas.create_window((0, 0), window=engine_frame, anchor="nw")
+        engine_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all")),
+        )
+        canvas.bind(
+            "<Configure>", lambda e: canvas.itemconfigure(window, width=e.width)
+        )
+
+        def scroll(event):
+            # Wheel events go to the widget under the pointer, so this is
+            # bound for every widget and only scrolls inside the settings
+            if not f"{event.widget}.".startswith(f"{outer}."):
+                return
+            if event.num == 4 or event.delta > 0:
+                canvas.yview_scroll(-1, "units")
+            else:
+                canvas.yview_scroll(1, "units")
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_all(sequence, scroll, add="+")
+
+        for name, default in ENGINE_SETTINGS.items():
+            if isinstance(default, bool):
+                self.engine_settings[name] = tk.BooleanVar(value=default)
+                ttk.Checkbutton(
+                    engine_frame,
+                    text=name,
+                    variable=self.engine_settings[name],
+                    bootstyle="primary-round-toggle",
+                ).pack(anchor="w", pady=3, padx=5)
+                continue
+
+            row = ttk.Frame(engine_frame)
+            row.pack(fill="x", pady=3, padx=5)
+            ttk.Label(row, text=name).pack(side="left")
+            if isinstance(default, int):
+                self.engine_settings[name] = tk.IntVar(value=default)
+                ttk.Spinbox(
+                    row,
+                    from_=0,
+                    to=10**9,
+                    width=10,
+                    textvariable=self.engine_settings[name],
+                ).pack(side="right")
+            elif name in ENGINE_CHOICES:
+                self.engine_settings[name] = tk.StringVar(value=default)
+                ttk.Combobox(
+                    row,
+                    textvariable=self.engine_settings[name],
+                    values=ENGINE_CHOICES[name],
+                    state="readonly",
+                    width=12,
+                ).pack(side="right")
+            else:
+                self.engine_settings[name] = tk.StringVar(value=default)
+                ttk.Entry(row, textvariable=self.engine_settings[name], width=30).pack(
+                    side="right"
+                )
+
     def build_status_tab(self):
         # --- Progress & File Count ---
         # status_frame = ttk.LabelFrame(self.status_tab, text="Status", padding=10)
@@ -268,6 +345,16 @@ class ScraperApp(ttk.Window):
             messagebox.showerror("Error", "Invalid URL format")
             return
 
+        options_dict = {k: v.get() for k, v in self.options.items()}
+        for name, var in self.engine_settings.items():
+            try:
+                options_dict[name] = var.get()
+            except tk.TclError:
+                # Spinboxes accept any text; IntVar.get() fails on non-numbers
+                messagebox.showerror("Error", f"Invalid value for {name!r}")
+                self.notebook.select(self.engine_tab)
+                return
+
         # Setup paths and folders (Moved to UI to handle immediate file system errors)
         custom = self.custom_name.get().strip()
         folder_name = custom if custom else domain.replace("www.", "")
@@ -289,7 +376,6 @@ class ScraperApp(ttk.Window):
 
         self.stop_event.clear()
         self.error_logs = []
-        options_dict = {k: v.get() for k, v in self.options.items()}
 
         # Start the core scraping logic in a separate thread
         self.scraping_thread = ScraperCore(
@@ -0,0 +1,130 @@
+# search.py
+"""Full-text search over scraped pages.
+
+Usage:
+    python search.py <output folder> "query terms" [--limit 20]
+
+The index (search.sqlite) is built while the crawl runs when "Build
+full-text search index" is on. Queries use SQLite FTS5 syntax, e.g.
+"python AND asyncio", "\"exact phrase\"" or "crawl*".
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+FILENAME = "search.sqlite"
+
+
+class SearchIndex:
+    """Incremental FTS5 index of page titles and text, written as pages finish.
+
+    Pages are added in batched transactions; a re-crawled URL replaces its
+    previous document.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, base_path, batch_size=BATCH_SIZE):
+        self.path = os.path.join(base_path, FILENAME)
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY, url TEXT UNIQUE);
+            CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5 (
+                title, text, tokenize = 'unicode61 remove_diacritics 2');
+            """)
+
+    def write(self, page_data, depth=None):
+        text = page_data.get("text")
+        if not text:
+            return
+        with self._lock:
+            self._pending.append((page_data["url"], page_data.get("title") or "", text))
+            if len(self._pending) >= self.batch_size:
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            # Merge the b-tree segments built by the many small batches
+            self._db.execute("INSERT INTO pages (pages) VALUES ('optimize')")
+            self._db.commit()
+            self._db.close()
+
+    def _commit(self):
+        if not self._pending:
+            return
+        with self._db:
+            for url, title, text in self._pending:
+                doc_id = self._db.execute(
+                    "INSERT INTO docs (url) VALUES (?)"
+                    " ON CONFLICT (url) DO UPDATE SET url = excluded.url"
+                    " RETURNING id",
+                    (url,),
+                ).fetchone()[0]
+                self._db.execute("DELETE FROM pages WHERE rowid = ?", (doc_id,))
+                self._db.execute(
+                    "INSERT INTO pages (rowid, title, text) VALUES (?, ?, ?)",
+                    (doc_id, title, text),
+                )
+        self._pending.clear()
+
+
+def search(base_path, query, limit=20):
+    """Returns [(url, title, snippet, score)] best match first.
+
+    Title matches weigh more than body text matches.
+    """
+    db = sqlite3.connect(f"file:{os.path.join(base_path, FILENAME)}?mode=ro", uri=True)
+    try:
+        return db.execute(
+            "SELECT docs.url, pages.title,"
+            " snippet(pages, 1, '[', ']', ' ... ', 12),"
+            " bm25(pages, 5.0, 1.0) AS score"
+            " FROM pages JOIN docs ON docs.id = pages.rowid"
+            " WHERE pages MATCH ? ORDER BY score LIMIT ?",
+            (query, limit),
+        ).fetchall()
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder", help="scrape output folder with search.sqlite")
+    parser.add_argument("query", help="FTS5 query")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        results = search(args.folder, args.query, args.limit)
+    except sqlite3.Error as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for url, title, snippet, score in results:
+        print(f"{-score:7.2f}  {url}")
+        if title:
+            print(f"         {title}")
+        print(f"         {' '.join(snippet.split())}")
+    print(f"{len(results)} results in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
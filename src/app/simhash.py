@@ -0,0 +1,112 @@
+# simhash.py
+"""SimHash fingerprints of page text and a banded index for near-duplicates.
+
+A page's text is cut into overlapping word shingles; each shingle hash
+votes on every bit of a 64-bit fingerprint. Pages that differ only in a
+few words (print views, sort orders, mirrored sections) end up a few bits
+apart. The index splits fingerprints into max_distance + 1 bands, so by
+the pigeonhole principle any fingerprint within max_distance bits of a
+stored one matches it exactly in at least one band.
+"""
+
+import hashlib
+import re
+
+import numpy as np
+
+BITS = 64
+SHINGLE_WORDS = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def simhash(text):
+    """Returns the 64-bit SimHash of text, or None if it has no words."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    # One hash per distinct word; shingles combine them with rotations
+    ids = {}
+    word_ids = np.fromiter(
+        (ids.setdefault(word, len(ids)) for word in words),
+        dtype=np.int64,
+        count=len(words),
+    )
+    word_hashes = np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(w.encode(), digest_size=8).digest(), "little"
+            )
+            for w in ids
+        ),
+        dtype=np.uint64,
+        count=len(ids),
+    )[word_ids]
+
+    # Texts shorter than a shingle make one shingle of all their words
+    shingle = min(SHINGLE_WORDS, len(word_hashes))
+    hashes = word_hashes[: len(word_hashes) - shingle + 1].copy()
+    for offset in range(1, shingle):
+        hashes ^= _rotate(word_hashes[offset : offset + len(hashes)], 21 * offset)
+    hashes = _mix(hashes)
+
+    bits = np.unpackbits(
+        hashes.astype("<u8").view(np.uint8).reshape(-1, 8), axis=1, bitorder="little"
+    )
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(hashes)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+
+def distance(a, b):
+    """Number of differing bits between two fingerprints."""
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """Fingerprints of the pages seen so far, searchable by bit distance."""
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.duplicates = 0
+        bands = max_distance + 1
+        width = BITS // bands
+        # (shift, mask) per band; the last band takes any leftover bits
+        self._bands = [
+            (i * width, (1 << (width if i < bands - 1 else BITS - i * width)) - 1)
+            for i in range(bands)
+        ]
+        # (band number, band value) -> [(fingerprint, url)]
+        self._buckets = {}
+
+    def check(self, url, fingerprint):
+        """Returns the URL of a stored near-duplicate of fingerprint.
+
+        If there is none, fingerprint is stored under url and None is
+        returned.
+        """
+        keys = [
+            (band, (fingerprint >> shift) & mask)
+            for band, (shift, mask) in enumerate(self._bands)
+        ]
+        for key in keys:
+            for other, other_url in self._buckets.get(key, ()):
+                if distance(fingerprint, other) <= self.max_distance:
+                    self.duplicates += 1
+                    return other_url
+        for key in keys:
+            self._buckets.setdefault(key, []).append((fingerprint, url))
+        return None
+
+
+def _rotate(values, bits):
+    bits %= BITS
+    return (values << np.uint64(bits)) | (values >> np.uint64(BITS - bits))
+
+
+def _mix(values):
+    """splitmix64 finalizer, so similar shingles get unrelated hashes."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
@@ -0,0 +1,384 @@
+# sinks.py
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+# Compression choices for the JSON Lines results file
+COMPRESSIONS = ("none", "gzip", "zstd")
+EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+BUFFER_SIZE = 1 << 20
+
+
+def open_text(path, mode, compression="none"):
+    """Opens a (possibly compressed) UTF-8 text file with a large buffer.
+
+    mode is "r", "w" or "a". Compressed files are appended to as new
+    gzip members / zstd frames, which readers decode back to back.
+    """
+    binary_mode = mode + "b"
+    if compression == "none":
+        return open(path, mode, encoding="utf-8", buffering=BUFFER_SIZE)
+    if compression == "gzip":
+        raw = gzip.GzipFile(path, binary_mode)
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression needs the zstandard package")
+        if mode == "r":
+            raw = zstandard.ZstdDecompressor().stream_reader(
+                open(path, "rb"), read_across_frames=True, closefd=True
+            )
+        else:
+            raw = zstandard.ZstdCompressor().stream_writer(
+                open(path, binary_mode), closefd=True
+            )
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    if mode == "r" and compression == "gzip":
+        # GzipFile buffers itself, and read1() hands over what it decoded
+        # before an unfinished member ends, where a buffered read drops it
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    if mode == "r":
+        buffered = io.BufferedReader(raw, BUFFER_SIZE)
+    else:
+        buffered = io.BufferedWriter(raw, BUFFER_SIZE)
+    return io.TextIOWrapper(buffered, encoding="utf-8")
+
+
+class JsonLinesSink:
+    """Writes each page as one JSON Lines record as soon as it is extracted."""
+
+    def __init__(self, base_path, compression="none", append=False):
+        self.compression = compression
+        self.path = os.path.join(
+            base_path, "data.jsonl" + EXTENSIONS.get(compression, "")
+        )
+        self.count = 0
+        if append and os.path.exists(self.path):
+            self._end_torn_record()
+        self._file = open_text(self.path, "a" if append else "w", compression)
+
+    def write(self, page_data, depth=None):
+        self._file.write(json.dumps(page_data, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+        # Compressors keep what they were given until flushed themselves
+        self._file.buffer.raw.flush()
+
+    def close(self):
+        self._file.close()
+
+    def records(self):
+        """Yields the records written so far (call after close()).
+
+        Pages written twice after an interrupted run are yielded once.
+        """
+        seen = set()
+        for line in self._lines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record["url"] not in seen:
+                seen.add(record["url"])
+                yield record
+
+    def _lines(self):
+        """Yields the lines of the file up to where a crash cut it short."""
+        with open_text(self.path, "r", self.compression) as f:
+            try:
+                yield from f
+            except (EOFError, zlib.error):
+                # A compressed member cut short by a crash ends the readable data
+                return
+
+    def _end_torn_record(self):
+        """Makes sure appended records don't continue one a crash cut short.
+
+        Readers give up at a gzip member or zstd frame that was never
+        finished, so compressed files are copied up to the last whole
+        record into a new file.
+        """
+        if self.compression == "none":
+            with open(self.path, "rb+") as f:
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        # The torn line is then skipped like any bad line
+                        f.write(b"\n")
+            return
+        tmp_path = self.path + ".tmp"
+        with open_text(tmp_path, "w", self.compression) as dst:
+            for line in self._lines():
+                if line.endswith("\n"):
+                    dst.write(line)
+        os.replace(tmp_path, self.path)
+
+
+class CsvSink:
+    """Writes pages to data.csv as they complete.
+
+    Columns are fixed by the first page. A column that first shows up later
+    is appended to the column list and the header is rewritten at the next
+    flush or on close. List fields (like links) go to data_lists.csv as one
+    (url, field, value) row per item instead of being dropped.
+
+    finished is given when resuming: the URLs the interrupted crawl
+    finished. Rows of any other page are dropped, as those pages are
+    fetched again.
+    """
+
+    def __init__(self, base_path, finished=None):
+        self.path = os.path.join(base_path, "data.csv")
+        self.lists_path = os.path.join(base_path, "data_lists.csv")
+        self.fields = []
+        self._index = {}
+        self._header_stale = False
+
+        if finished is not None and os.path.exists(self.path):
+            self._keep_finished(finished)
+            mode = "a"
+        else:
+            mode = "w"
+        self._file = self._open(mode)
+        self._writer = csv.writer(self._file)
+        self._lists_file = open(
+            self.lists_path, mode, newline="", encoding="utf-8", buffering=BUFFER_SIZE
+        )
+        self._lists_writer = csv.writer(self._lists_file)
+        if mode == "w":
+            self._lists_writer.writerow(["url", "field", "value"])
+
+    def write(self, page_data, depth=None):
+        scalars = {}
+        for key, value in page_data.items():
+            if isinstance(value, list):
+                self._lists_writer.writerows(
+                    [page_data.get("url", ""), key, item] for item in value
+                )
+            else:
+                scalars[key] = value
+
+        if not self.fields:
+            # The first page decides the initial header
+            self._add_fields(sorted(scalars))
+            self._writer.writerow(self.fields)
+        new_fields = [key for key in scalars if key not in self._index]
+        if new_fields:
+            self._add_fields(new_fields)
+            self._header_stale = True
+
+        row = [""] * len(self.fields)
+        for key, value in scalars.items():
+            row[self._index[key]] = value
+        self._writer.writerow(row)
+
+    def flush(self):
+        self._lists_file.flush()
+        if self._header_stale:
+            # Rows flushed here can be checkpointed, and a resumed crawl
+            # reads their columns from the header on disk
+            self._file.close()
+            self._rewrite_header()
+            self._file = self._open("a")
+            self._writer = csv.writer(self._file)
+        else:
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+        self._lists_file.close()
+        if self._header_stale:
+            self._rewrite_header()
+
+    def _open(self, mode):
+        return open(
+            self.path, mode, newline="", encoding="utf-8", buffering=BUFFER_SIZE
+        )
+
+    def _add_fields(self, names):
+        for name in names:
+            self._index[name] = len(self.fields)
+            self.fields.append(name)
+
+    def _keep_finished(self, finished):
+        """Drops the rows of pages the interrupted crawl didn't finish.
+
+        Rows written after its last flush may also have columns that the
+        header on disk doesn't name; those pages are never finished.
+        """
+        with open(self.path, newline="", encoding="utf-8") as f:
+            self._add_fields(next(csv.reader(f), []))
+        width = len(self.fields)
+        url = self._index.get("url")
+
+        def rows(reader):
+            yield next(reader, [])
+            for row in reader:
+                if url is not None and url < len(row) <= width:
+                    if row[url] in finished:
+                        yield row
+
+        def list_rows(reader):
+            yield next(reader, [])
+            for row in reader:
+                if row and row[0] in finished:
+                    yield row
+
+        _rewrite_csv(self.path, rows)
+        if os.path.exists(self.lists_path):
+            _rewrite_csv(self.lists_path, list_rows)
+
+    def _rewrite_header(self):
+        """Streams data.csv into a copy with the final header and padded rows."""
+        width = len(self.fields)
+
+        def rows(reader):
+            next(reader, None)
+            yield self.fields
+            for row in reader:
+                yield row + [""] * (width - len(row))
+
+        _rewrite_csv(self.path, rows)
+        self._header_stale = False
+
+
+def _rewrite_csv(path, transform):
+    """Replaces the CSV file at path with the rows transform(reader) yields."""
+    tmp_path = path + ".tmp"
+    with open(path, newline="", encoding="utf-8") as src, open(
+        tmp_path, "w", newline="", encoding="utf-8", buffering=BUFFER_SIZE
+    ) as dst:
+        csv.writer(dst).writerows(transform(csv.reader(src)))
+    os.replace(tmp_path, path)
+
+
+class SqliteSink:
+    """Stores pages, links, assets and errors in data.sqlite.
+
+    Rows are buffered and written in batched transactions on a WAL-mode
+    database, so the crawl loop never waits on a commit per page. Pages are
+    upserted by URL, so re-crawling into the same folder updates rows in
+    place. Asset rows may come from download threads; a lock guards the
+    buffers and the connection.
+    """
+
+    BATCH_SIZE = 500
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY, host TEXT, depth INTEGER, title TEXT,
+            description TEXT, keywords TEXT, text TEXT, crawled_at REAL,
+            duplicate_of TEXT);
+        CREATE INDEX IF NOT EXISTS pages_host ON pages (host);
+        CREATE INDEX IF NOT EXISTS pages_depth ON pages (depth);
+        CREATE TABLE IF NOT EXISTS links (page_url TEXT, link TEXT);
+        CREATE INDEX IF NOT EXISTS links_page ON links (page_url);
+        CREATE TABLE IF NOT EXISTS assets (
+            url TEXT PRIMARY KEY, page_url TEXT, kind TEXT, path TEXT,
+            size INTEGER, saved_at REAL);
+        CREATE INDEX IF NOT EXISTS assets_page ON assets (page_url);
+        CREATE TABLE IF NOT EXISTS errors (
+            url TEXT, message TEXT, at REAL);
+        CREATE INDEX IF NOT EXISTS errors_url ON errors (url);
+    """
+
+    def __init__(self, base_path, batch_size=BATCH_SIZE):
+        self.path = os.path.join(base_path, "data.sqlite")
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pages = []
+        self._links = []
+        self._assets = []
+        self._errors = []
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only syncs at checkpoints, not on every commit
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA cache_size=-65536")
+        self._db.executescript(self.SCHEMA)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(pages)")]
+        if "duplicate_of" not in columns:
+            # Databases from before near-duplicate detection
+            self._db.execute("ALTER TABLE pages ADD COLUMN duplicate_of TEXT")
+
+    def write(self, page_data, depth=None):
+        url = page_data["url"]
+        row = (
+            url,
+            urlsplit(url).netloc,
+            depth,
+            page_data.get("title"),
+            page_data.get("description"),
+            page_data.get("keywords"),
+            page_data.get("text"),
+            time.time(),
+            page_data.get("near_duplicate_of"),
+        )
+        with self._lock:
+            self._pages.append(row)
+            self._links.append((url, page_data.get("links", ())))
+            if len(self._pages) >= self.batch_size:
+                self._commit()
+
+    def write_asset(self, url, page_url, kind, path, size):
+        with self._lock:
+            self._assets.append((url, page_url, kind, path, size, time.time()))
+            if len(self._assets) >= self.batch_size:
+                self._commit()
+
+    def write_error(self, url, message):
+        with self._lock:
+            self._errors.append((url, message, time.time()))
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
+
+    def _commit(self):
+        """Writes every buffered row in one transaction. Caller holds the lock."""
+        if not (self._pages or self._assets or self._errors):
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (url) DO UPDATE SET host = excluded.host,"
+                " depth = excluded.depth, title = excluded.title,"
+                " description = excluded.description, keywords = excluded.keywords,"
+                " text = excluded.text, crawled_at = excluded.crawled_at,"
+                " duplicate_of = excluded.duplicate_of",
+                self._pages,
+            )
+            # A re-crawled page replaces its whole link list
+            self._db.executemany(
+                "DELETE FROM links WHERE page_url = ?",
+                [(url,) for url, _ in self._links],
+            )
+            self._db.executemany(
+                "INSERT INTO links VALUES (?, ?)",
+                ((url, link) for url, links in self._links for link in links),
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?)",
+                self._assets,
+            )
+            self._db.executemany("INSERT INTO errors VALUES (?, ?, ?)", self._errors)
+        self._pages.clear()
+        self._links.clear()
+        self._assets.clear()
+        self._errors.clear()
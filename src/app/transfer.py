@@ -0,0 +1,379 @@
+# transfer.py
+"""Resumable, optionally segmented downloads of large files.
+
+A download streams into a .part file; a small .part.json next to it keeps
+the server's validator (ETag or Last-Modified) and, for segmented
+downloads, how far each byte range got. A later attempt continues with
+HTTP Range requests, guarded by If-Range so a file that changed on the
+server starts over instead of being spliced.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+
+import requests
+
+from gating import ResourceRejected
+
+# Large reads and writes; videos are often many hundreds of MB
+CHUNK_SIZE = 1 << 20
+# Attempts per stream or segment before giving up, resuming each time
+RETRIES = 3
+# Files smaller than this per segment are not worth extra connections
+MIN_SEGMENT_SIZE = 4 << 20
+# Segment progress is saved after at most this many new bytes
+STATE_EVERY = 16 << 20
+
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+
+
+class DownloadCancelled(Exception):
+    """The stop event was set; the .part file is kept for a later resume."""
+
+
+class IntegrityError(Exception):
+    """The finished file does not match the size or digest the server sent."""
+
+
+def download(
+    url,
+    part_path,
+    headers,
+    timeout,
+    stop_event,
+    segments=1,
+    check=None,
+    max_bytes=None,
+    session=None,
+):
+    """Downloads url into part_path, resuming an earlier partial download.
+
+    With segments > 1 and a server that supports ranges, the file is
+    fetched over that many connections at once. headers may carry
+    conditional headers. check(resp) is called on the first response
+    before any body is read and may raise to abort; a stream that grows
+    past max_bytes raises ResourceRejected. Requests go through session
+    (anything with a requests-style get()) when given. Returns (response
+    headers, sha1 hex, size), or None if the server answered 304 Not
+    Modified.
+    """
+    get = (session or requests).get
+    # Byte ranges and sizes must refer to the bytes as stored
+    headers = {**headers, "Accept-Encoding": "identity"}
+    state_path = part_path + ".json"
+    state = _load_state(state_path)
+    if not os.path.exists(part_path):
+        state = {}
+
+    request_headers = dict(headers)
+    validator = state.get("validator")
+    probe = segments > 1 or "segments" in state
+    if probe:
+        # One byte tells range support, size and validator, and (with
+        # If-Range) whether the saved segments are still current
+        request_headers["Range"] = "bytes=0-0"
+        if validator and "segments" in state:
+            request_headers["If-Range"] = validator
+    elif validator and os.path.getsize(part_path):
+        request_headers.update(
+            {"Range": f"bytes={os.path.getsize(part_path)}-", "If-Range": validator}
+        )
+
+    resp = get(url, headers=request_headers, timeout=timeout, stream=True)
+    if resp.status_code == 416 and "Range" in request_headers:
+        # The saved part no longer fits the file; start over
+        resp.close()
+        for path in (part_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return download(
+            url,
+            part_path,
+            headers,
+            timeout,
+            stop_event,
+            segments,
+            check,
+            max_bytes,
+            session,
+        )
+    resp.raise_for_status()
+    if resp.status_code == 304:
+        resp.close()
+        return None
+    if check:
+        try:
+            check(resp)
+        except Exception:
+            resp.close()
+            raise
+    response_headers = resp.headers
+    digests = _expected_digests(resp)
+    validator = _validator(resp.headers)
+
+    if resp.status_code == 206 and probe:
+        resp.close()
+        total = _content_range(resp.headers)[1]
+        if "segments" not in state or state["validator"] != validator:
+            count = min(segments, total // MIN_SEGMENT_SIZE) if total else 1
+            _start(part_path, state_path, validator, total, count if validator else 1)
+            state = _load_state(state_path)
+    elif resp.status_code == 206:
+        start, total = _content_range(resp.headers)
+        with open(part_path, "ab", buffering=CHUNK_SIZE) as f:
+            if start != f.tell():
+                resp.close()
+                raise IntegrityError(f"server resumed at byte {start}")
+            _copy(resp, f, stop_event, max_bytes)
+    else:
+        # A full response: no range support, or the file changed
+        total = _content_length(resp.headers)
+        ranges = resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+        count = 1
+        if ranges and validator and total:
+            count = min(segments, total // MIN_SEGMENT_SIZE)
+        _start(part_path, state_path, validator, total, count)
+        state = _load_state(state_path)
+        if "segments" in state:
+            resp.close()
+        else:
+            with open(part_path, "wb", buffering=CHUNK_SIZE) as f:
+                _copy(resp, f, stop_event, max_bytes)
+
+    if "segments" in state:
+        _download_segments(get, url, part_path, headers, timeout, stop_event, state)
+    else:
+        _finish_stream(
+            get,
+            url,
+            part_path,
+            headers,
+            timeout,
+            stop_event,
+            total,
+            validator,
+            max_bytes,
+        )
+
+    digest, size = _verify(part_path, total, digests)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return response_headers, digest, size
+
+
+def _start(part_path, state_path, validator, total, segments):
+    """Creates an empty part file and its state for a fresh download."""
+    state = {"validator": validator}
+    with open(part_path, "wb") as f:
+        if segments > 1:
+            f.truncate(total)
+            state.update({"total": total, "segments": _split(total, segments)})
+    _save_state(state_path, state)
+
+
+def _finish_stream(
+    get, url, part_path, headers, timeout, stop_event, total, validator, max_bytes=None
+):
+    """Fetches whatever a single stream is still missing, retrying on errors.
+
+    Continuing a non-empty part needs a validator for If-Range.
+    """
+    for _ in range(RETRIES):
+        size = os.path.getsize(part_path)
+        if (total is not None and size >= total) or (size and not validator):
+            return
+        range_headers = {**headers, "Range": f"bytes={size}-"}
+        if validator:
+            range_headers["If-Range"] = validator
+        try:
+            resp = get(url, headers=range_headers, timeout=timeout, stream=True)
+            resp.raise_for_status()
+            if resp.status_code == 206:
+                if _content_range(resp.headers)[0] != size:
+                    resp.close()
+                    raise IntegrityError("server resumed at the wrong byte")
+            elif size:
+                resp.close()
+                raise IntegrityError("file changed on the server while downloading")
+            with open(part_path, "ab", buffering=CHUNK_SIZE) as f:
+                _copy(resp, f, stop_event, max_bytes)
+            if total is None:
+                return
+        except TRANSIENT_ERRORS:
+            continue
+
+
+def _download_segments(get, url, part_path, headers, timeout, stop_event, state):
+    """Fetches the unfinished byte ranges in state on parallel connections."""
+    state_path = part_path + ".json"
+    lock = threading.Lock()
+    errors = []
+
+    def fetch(segment):
+        start, end = segment[0], segment[1]
+        for attempt in range(RETRIES):
+            offset = start + segment[2]
+            if offset > end:
+                return
+            try:
+                resp = get(
+                    url,
+                    headers={
+                        **headers,
+                        "Range": f"bytes={offset}-{end}",
+                        "If-Range": state["validator"],
+                    },
+                    timeout=timeout,
+                    stream=True,
+                )
+                resp.raise_for_status()
+                if resp.status_code != 206 or _content_range(resp.headers)[0] != offset:
+                    resp.close()
+                    raise IntegrityError("file changed on the server while downloading")
+                written = segment[2]
+                try:
+                    with resp, open(part_path, "r+b") as f:
+                        f.seek(offset)
+                        for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                            if stop_event.is_set():
+                                raise DownloadCancelled()
+                            chunk = chunk[: end + 1 - start - written]
+                            f.write(chunk)
+                            written += len(chunk)
+                            if written - segment[2] >= STATE_EVERY:
+                                # Only bytes flushed to the file count as done
+                                f.flush()
+                                segment[2] = written
+                                with lock:
+                                    _save_state(state_path, state)
+                finally:
+                    # The file is closed, so everything written is flushed
+                    segment[2] = written
+                return
+            except TRANSIENT_ERRORS:
+                if attempt == RETRIES - 1:
+                    raise
+
+    def run(segment):
+        try:
+            fetch(segment)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=run, args=(segment,), daemon=True)
+        for segment in state["segments"]
+        if segment[0] + segment[2] <= segment[1]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Progress is kept whether or not every segment made it
+    _save_state(state_path, state)
+    if errors:
+        raise errors[0]
+
+
+def _expected_digests(resp):
+    """Returns {hashlib name: base64 digest} the server sent for the file."""
+    expected = {}
+    for item in resp.headers.get("Digest", "").split(","):
+        algorithm, _, value = item.strip().partition("=")
+        if algorithm.lower() in ("md5", "sha-256"):
+            expected[algorithm.lower().replace("-", "")] = value
+    # Content-MD5 covers the message body, i.e. the whole file only on a 200
+    if resp.status_code == 200 and resp.headers.get("Content-MD5"):
+        expected["md5"] = resp.headers["Content-MD5"]
+    return expected
+
+
+def _verify(part_path, total, expected):
+    """Checks the size and any digests the server sent; returns (sha1, size)."""
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        raise IntegrityError(f"expected {total} bytes, got {size}")
+
+    hashers = {name: hashlib.new(name) for name in expected}
+    sha1 = hashlib.sha1()
+    with open(part_path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha1.update(chunk)
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    for name, value in expected.items():
+        if base64.b64encode(hashers[name].digest()).decode() != value:
+            # Bad bytes can't be resumed; start clean next time
+            os.remove(part_path)
+            raise IntegrityError(f"{name} digest mismatch")
+    return sha1.hexdigest(), size
+
+
+def _copy(resp, f, stop_event, max_bytes=None):
+    """Streams resp into f. A dropped connection just ends the copy; the
+    caller compares sizes and resumes."""
+    try:
+        with resp:
+            for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                if stop_event.is_set():
+                    raise DownloadCancelled()
+                f.write(chunk)
+                if max_bytes and f.tell() > max_bytes:
+                    raise ResourceRejected(
+                        f"body is over the limit of {max_bytes} bytes"
+                    )
+    except TRANSIENT_ERRORS:
+        pass
+
+
+def _split(total, segments):
+    """Returns [start, end, bytes done] for segments equal byte ranges."""
+    step = -(-total // segments)
+    return [[start, min(start + step, total) - 1, 0] for start in range(0, total, step)]
+
+
+def _validator(headers):
+    """Strong ETag or Last-Modified, usable in If-Range; None otherwise."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _content_length(headers):
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _content_range(headers):
+    """Returns (first byte, total size or None) from a Content-Range header."""
+    match = re.match(r"bytes (\d+)-\d+/(\d+|\*)", headers.get("Content-Range", ""))
+    if not match:
+        raise IntegrityError("missing Content-Range in a partial response")
+    total = match.group(2)
+    return int(match.group(1)), int(total) if total != "*" else None
+
+
+def _load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
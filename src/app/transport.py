@@ -0,0 +1,270 @@
+# transport.py
+"""The pooled HTTP session shared by all of a crawl's requests.
+
+Connections are kept alive and reused per host. Failed requests are
+retried with exponential backoff and full jitter, and a host that keeps
+failing is refused for a while by a circuit breaker instead of costing a
+timeout on every URL. requests already asks for every compression urllib3
+can decode (gzip and deflate, plus br and zstd when brotli or zstandard
+is installed), so the session keeps its default Accept-Encoding.
+"""
+
+import collections
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError
+
+# Responses worth another try: the server is overloaded or briefly down
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+# Longest wait between attempts, including a server's Retry-After
+MAX_BACKOFF = 30
+# Hosts whose connection pools are kept open, least recently used dropped
+POOL_HOSTS = 100
+
+
+class HostUnavailable(requests.exceptions.RequestException):
+    """The host's circuit breaker is open; nothing was sent."""
+
+
+class CircuitBreaker:
+    """Per-host breaker. After threshold failures in a row a host is
+    refused for cooldown seconds; then a single trial request decides
+    whether it is closed again. A threshold of 0 turns it off."""
+
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.trips = 0
+        self._lock = threading.Lock()
+        # host -> consecutive failures; host -> monotonic reopen time
+        self._failures = {}
+        self._open_until = {}
+
+    def allow(self, host):
+        """Raises HostUnavailable while host's breaker is open."""
+        if not self.threshold:
+            return
+        with self._lock:
+            until = self._open_until.get(host)
+            if until is None:
+                return
+            now = time.monotonic()
+            if now < until:
+                raise HostUnavailable(
+                    f"{host} failed {self._failures[host]} times in a row,"
+                    f" retrying in {until - now:.0f} s"
+                )
+            # Half open: this request is the trial, others keep waiting
+            self._open_until[host] = now + self.cooldown
+
+    def success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._open_until.pop(host, None)
+
+    def failure(self, host):
+        if not self.threshold:
+            return
+        with self._lock:
+            failures = self._failures[host] = self._failures.get(host, 0) + 1
+            if failures >= self.threshold:
+                if failures == self.threshold:
+                    self.trips += 1
+                self._open_until[host] = time.monotonic() + self.cooldown
+
+
+class Transport:
+    """A requests.Session with retries, backoff and a circuit breaker.
+
+    get() takes the same arguments as requests.get(), so it can stand in
+    for requests wherever a session is accepted. New connections look their
+    host up through resolver (a dnscache.DnsCache) when one is given. Safe
+    to share between threads.
+    """
+
+    def __init__(
+        self,
+        headers=None,
+        pool_size=10,
+        retries=3,
+        backoff=0.5,
+        breaker_failures=5,
+        breaker_cooldown=60,
+        stop_event=None,
+        resolver=None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_failures, breaker_cooldown)
+        self.stop_event = stop_event
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = _PoolAdapter(
+            self._count,
+            resolver,
+            pool_connections=POOL_HOSTS,
+            pool_maxsize=pool_size,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Sends a request, retrying idempotent ones on connection errors
+        and RETRY_STATUSES. Returns the last response, whatever its status.
+        """
+        host = urlsplit(url).netloc
+        self.breaker.allow(host)
+        retries = self.retries if method.upper() in IDEMPOTENT_METHODS else 0
+        for attempt in range(retries + 1):
+            self._count("requests")
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except requests.exceptions.SSLError:
+                # A bad certificate won't get better by asking again
+                self.breaker.failure(host)
+                raise
+            except RETRY_ERRORS:
+                if attempt == retries or self._stopped():
+                    self.breaker.failure(host)
+                    raise
+                self._wait(attempt)
+                continue
+
+            if resp.status_code in RETRY_STATUSES:
+                if attempt < retries and not self._stopped():
+                    delay = _retry_after(resp)
+                    resp.close()
+                    self._wait(attempt, delay)
+                    continue
+                if resp.status_code >= 500:
+                    self.breaker.failure(host)
+                    return resp
+            self.breaker.success(host)
+            return resp
+
+    def stats(self):
+        """Returns counts of requests, connections opened, retries and
+        breaker trips."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["breaker_trips"] = self.breaker.trips
+        return stats
+
+    def summary(self):
+        """One log line on connection reuse and failures."""
+        stats = self.stats()
+        sent = stats.get("requests", 0)
+        opened = stats.get("connections", 0)
+        reused = 1 - opened / sent if sent else 0
+        return (
+            f"HTTP: {sent} requests over {opened} connections ({reused:.0%} reused),"
+            f" {stats.get('retries', 0)} retries,"
+            f" circuit breaker tripped {stats['breaker_trips']} times"
+        )
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _wait(self, attempt, delay=None):
+        """Sleeps before a retry; a stop cuts the wait short."""
+        self._count("retries")
+        if delay is None:
+            # Full jitter, so clients that failed together don't retry together
+            delay = random.uniform(0, self.backoff * 2**attempt)
+        delay = min(delay, MAX_BACKOFF)
+        if self.stop_event is not None:
+            self.stop_event.wait(delay)
+        else:
+            time.sleep(delay)
+
+
+class _PoolAdapter(HTTPAdapter):
+    """HTTPAdapter that reports every TCP connection its pools open and
+    resolves host names through resolver, if any.
+
+    A pooled connection object reconnects in place when the server closed
+    it, so connect() calls are counted rather than new pool entries.
+    """
+
+    def __init__(self, on_connect, resolver=None, **kwargs):
+        self._on_connect = on_connect
+        self._resolver = resolver
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_connect = self._on_connect
+        resolver = self._resolver
+
+        def pooled(pool_class):
+            class PooledConnection(pool_class.ConnectionCls):
+                def connect(self):
+                    on_connect("connections")
+                    return super().connect()
+
+                def _new_conn(self):
+                    if resolver is None:
+                        return super()._new_conn()
+                    name = self._dns_host
+                    try:
+                        addresses = resolver.resolve(name, self.port)
+                    except (OSError, UnicodeError) as e:
+                        raise NameResolutionError(self.host, self, e) from e
+                    # Connect to each address in turn, as urllib3 would;
+                    # TLS still verifies and sends self.host
+                    error = None
+                    for _, _, _, _, sockaddr in addresses:
+                        self._dns_host = sockaddr[0]
+                        try:
+                            return super()._new_conn()
+                        except ConnectTimeoutError as e:
+                            error = e
+                        finally:
+                            self._dns_host = name
+                    raise error
+
+            # Errors then name the usual HTTPConnection/HTTPSConnection
+            PooledConnection.__name__ = pool_class.ConnectionCls.__name__
+            return type(
+                pool_class.__name__, (pool_class,), {"ConnectionCls": PooledConnection}
+            )
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": pooled(HTTPConnectionPool),
+            "https": pooled(HTTPSConnectionPool),
+        }
+
+
+def _retry_after(resp):
+    """Seconds from a Retry-After header, or None for the default backoff."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,208 @@
+# urlcanon.py
+"""URL canonicalization and crawler-trap heuristics, applied before enqueue.
+
+Different spellings of one page (fragments, letter case, default ports,
+percent-encoding, query order, tracking and session parameters) become a
+single URL, so the frontier's seen set catches them. TrapDetector then
+drops URLs that look machine-generated without end, such as calendars,
+endless pagination or relative links that keep nesting a path.
+"""
+
+import collections
+import re
+from urllib.parse import quote, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track the visitor or the campaign
+TRACKING_PARAMS = frozenset(
+    (
+        "gclid",
+        "dclid",
+        "fbclid",
+        "msclkid",
+        "yclid",
+        "igshid",
+        "mc_cid",
+        "mc_eid",
+        "_ga",
+        "_gl",
+        "_hsenc",
+        "_hsmi",
+    )
+)
+TRACKING_PREFIXES = ("utm_",)
+# Session IDs, in the query or as a ;name=value path parameter
+SESSION_PARAMS = frozenset(
+    (
+        "jsessionid",
+        "phpsessid",
+        "aspsessionid",
+        "sessionid",
+        "session_id",
+        "sid",
+        "cfid",
+        "cftoken",
+    )
+)
+
+# Characters left as they are; everything else outside ASCII is escaped
+_PATH_SAFE = "/:@!$&'()*+,;=%~"
+_QUERY_SAFE = _PATH_SAFE + "?"
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_UNRESERVED = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~"
+)
+_PATH_PARAM = re.compile(r";\s*(" + "|".join(SESSION_PARAMS) + r")=[^/;]*", re.I)
+_DIGITS = re.compile(r"\d+")
+
+
+def canonicalize_url(url, strip_params=True):
+    """Returns the canonical form of an absolute http(s) URL.
+
+    The fragment is dropped, scheme and host lowercased, a default port
+    removed, dot segments resolved and percent-encoding normalized (escapes
+    of unreserved characters decoded, the rest uppercased). Query
+    parameters are sorted by name; with strip_params, tracking and session
+    parameters are removed first.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    host = (parts.hostname or "").rstrip(".")
+    if host:
+        if ":" in host:
+            host = f"[{host}]"
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if port and port != DEFAULT_PORTS.get(scheme):
+            host = f"{host}:{port}"
+        userinfo = netloc.rpartition("@")[0]
+        netloc = f"{userinfo}@{host}" if userinfo else host
+
+    path = parts.path
+    if strip_params and ";" in path:
+        path = _PATH_PARAM.sub("", path)
+    path = _remove_dot_segments(_normalize_escapes(quote(path, safe=_PATH_SAFE)))
+    query = parts.query
+    if query:
+        query = _canonical_query(query, strip_params)
+    return urlunsplit((scheme, netloc, path or "/", query, ""))
+
+
+def canonicalize_links(links, strip_params=True):
+    """Canonicalizes (link, netloc) pairs, dropping repeats, in page order."""
+    canonical = {}
+    for link, _ in links:
+        link = canonicalize_url(link, strip_params)
+        if link not in canonical:
+            canonical[link] = urlsplit(link).netloc
+    return list(canonical.items())
+
+
+class TrapDetector:
+    """Heuristics that flag URLs a crawler could follow forever.
+
+    A URL is a likely trap when it is very long, when one path segment
+    repeats (relative links nesting themselves) or when its query keeps
+    growing. With max_per_pattern set, it is also one once its pattern
+    (host, path with numbers masked and query parameter names) produced
+    that many URLs, as calendars and endless pagination do; that cap is
+    off by default, as sites with numeric page IDs share a pattern too.
+    """
+
+    MAX_URL_LENGTH = 2048
+    MAX_SEGMENT_REPEATS = 3
+    MAX_QUERY_PARAMS = 16
+    MAX_PARAM_REPEATS = 4
+
+    def __init__(self, max_per_pattern=0):
+        self.max_per_pattern = max_per_pattern
+        self.dropped = 0
+        self._patterns = collections.Counter()
+
+    def check(self, url):
+        """Returns why url looks like a trap, or None and counts it in."""
+        reason = self._reason(url)
+        if reason:
+            self.dropped += 1
+        return reason
+
+    def _reason(self, url):
+        if len(url) > self.MAX_URL_LENGTH:
+            return f"URL is over {self.MAX_URL_LENGTH} characters"
+        parts = urlsplit(url)
+
+        segments = [segment for segment in parts.path.split("/") if segment]
+        if len(segments) >= self.MAX_SEGMENT_REPEATS:
+            segment, count = collections.Counter(segments).most_common(1)[0]
+            if count >= self.MAX_SEGMENT_REPEATS:
+                return f"path segment '{segment}' repeats {count} times"
+
+        names = [pair.partition("=")[0] for pair in parts.query.split("&") if pair]
+        if len(names) > self.MAX_QUERY_PARAMS:
+            return f"{len(names)} query parameters"
+        if names:
+            name, count = collections.Counter(names).most_common(1)[0]
+            if count >= self.MAX_PARAM_REPEATS:
+                return f"query parameter '{name}' repeats {count} times"
+
+        if self.max_per_pattern:
+            pattern = (
+                parts.netloc,
+                _DIGITS.sub("#", parts.path),
+                tuple(sorted(set(names))),
+            )
+            if self._patterns[pattern] >= self.max_per_pattern:
+                return f"over {self.max_per_pattern} URLs like {pattern[1]}"
+            self._patterns[pattern] += 1
+        return None
+
+
+def _canonical_query(query, strip_params):
+    pairs = []
+    for pair in query.split("&"):
+        if not pair:
+            continue
+        name = pair.partition("=")[0].lower()
+        if strip_params and (
+            name in TRACKING_PARAMS
+            or name in SESSION_PARAMS
+            or name.startswith(TRACKING_PREFIXES)
+        ):
+            continue
+        pairs.append(_normalize_escapes(quote(pair, safe=_QUERY_SAFE)))
+    # Stable on names, so repeated parameters keep their order
+    pairs.sort(key=lambda pair: pair.partition("=")[0])
+    return "&".join(pairs)
+
+
+def _normalize_escapes(text):
+    if "%" not in text:
+        return text
+
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in _UNRESERVED else "%" + match.group(1).upper()
+
+    return _ESCAPE.sub(fix, text)
+
+
+def _remove_dot_segments(path):
+    """RFC 3986 section 5.2.4, for paths urljoin() leaves untouched."""
+    if "." not in path:
+        return path
+    output = []
+    segments = path.split("/")
+    for segment in segments[1:] if path.startswith("/") else segments:
+        if segment == "..":
+            if output:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if segments[-1] in (".", ".."):
+        # "/a/b/.." names the directory "/a/"
+        output.append("")
+    return ("/" if path.startswith("/") else "") + "/".join(output)
@@ -0,0 +1,222 @@
+# crawlkit.py
+"""HTTP transport, crawl budget and frontier shared by the standalone
+scrapers (scrape.py, pytube.py and gemini.py); keep it next to them."""
+
+import collections
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# One pooled session per scrape: keep-alive per host, retries with
+# exponential backoff and jitter, and a per-host circuit breaker
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+MAX_BACKOFF = 30
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 60
+
+
+class HostUnavailable(requests.exceptions.RequestException):
+    """The host failed too often in a row; nothing was sent."""
+
+
+class Transport:
+    """requests.Session with retries and a per-host circuit breaker.
+
+    Counts requests and TCP connections so reuse can be reported.
+    """
+
+    def __init__(self, headers, pool_size, stop_event=None):
+        self.stop_event = stop_event
+        self.stats = collections.Counter()
+        self._lock = threading.Lock()
+        # host -> failures in a row; host -> time its breaker closes
+        self._failures = {}
+        self._open_until = {}
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=100, pool_maxsize=pool_size)
+        pools = adapter.poolmanager.pool_classes_by_scheme
+        adapter.poolmanager.pool_classes_by_scheme = {
+            scheme: self._counting(pool) for scheme, pool in pools.items()
+        }
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url, **kwargs):
+        host = urlparse(url).netloc
+        with self._lock:
+            until = self._open_until.get(host)
+            if until is not None:
+                if time.monotonic() < until:
+                    raise HostUnavailable(f"{host} keeps failing, skipped for now")
+                # Let one trial request through
+                self._open_until[host] = time.monotonic() + BREAKER_COOLDOWN
+        for attempt in range(HTTP_RETRIES + 1):
+            self._count("requests")
+            try:
+                resp = self.session.get(url, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if (
+                    attempt == HTTP_RETRIES
+                    or self._stopped()
+                    or isinstance(e, requests.exceptions.SSLError)
+                ):
+                    self._failed(host)
+                    raise
+                self._backoff(attempt)
+                continue
+            if (
+                resp.status_code in RETRY_STATUSES
+                and attempt < HTTP_RETRIES
+                and not self._stopped()
+            ):
+                retry_after = resp.headers.get("Retry-After", "")
+                resp.close()
+                self._backoff(
+                    attempt, int(retry_after) if retry_after.isdigit() else None
+                )
+                continue
+            if resp.status_code >= 500:
+                self._failed(host)
+            else:
+                with self._lock:
+                    self._failures.pop(host, None)
+                    self._open_until.pop(host, None)
+            return resp
+
+    def summary(self):
+        sent, opened = self.stats["requests"], self.stats["connections"]
+        reused = 1 - opened / sent if sent else 0
+        return (
+            f"HTTP: {sent} requests over {opened} connections ({reused:.0%} reused),"
+            f" {self.stats['retries']} retries,"
+            f" circuit breaker tripped {self.stats['trips']} times"
+        )
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _counting(self, pool_class):
+        count = self._count
+
+        class CountingConnection(pool_class.ConnectionCls):
+            def connect(self):
+                count("connections")
+                return super().connect()
+
+        return type(
+            pool_class.__name__, (pool_class,), {"ConnectionCls": CountingConnection}
+        )
+
+    def _stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def _failed(self, host):
+        with self._lock:
+            failures = self._failures[host] = self._failures.get(host, 0) + 1
+            if failures >= BREAKER_FAILURES:
+                self.stats["trips"] += failures == BREAKER_FAILURES
+                self._open_until[host] = time.monotonic() + BREAKER_COOLDOWN
+
+    def _backoff(self, attempt, delay=None):
+        self._count("retries")
+        if delay is None:
+            # Full jitter, so clients that failed together don't retry together
+            delay = random.uniform(0, HTTP_BACKOFF * 2**attempt)
+        delay = min(delay, MAX_BACKOFF)
+        if self.stop_event is not None:
+            self.stop_event.wait(delay)
+        else:
+            time.sleep(delay)
+
+
+# Crawl budget, 0 = no limit. Bytes count pages and downloaded media.
+MAX_DEPTH = 3
+MAX_PAGES = 0
+MAX_PAGES_PER_HOST = 0
+MAX_MB = 0
+MAX_MINUTES = 0
+
+
+class CrawlBudget:
+    """Page, byte and time limits, checked before a URL is queued."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.pages = 0
+        self.bytes = 0
+        self._host_pages = collections.Counter()
+        self._lock = threading.Lock()
+
+    def admit(self, url, depth):
+        """Returns True and counts the page if url fits the budget."""
+        host = urlparse(url).netloc
+        if depth > MAX_DEPTH or self.used_up():
+            return False
+        if MAX_PAGES and self.pages >= MAX_PAGES:
+            return False
+        if MAX_PAGES_PER_HOST and self._host_pages[host] >= MAX_PAGES_PER_HOST:
+            return False
+        self.pages += 1
+        self._host_pages[host] += 1
+        return True
+
+    def used_up(self):
+        """True once the crawl's time or byte budget is spent."""
+        elapsed = time.monotonic() - self.started
+        return bool(
+            (MAX_MINUTES and elapsed >= MAX_MINUTES * 60)
+            or (MAX_MB and self.bytes >= MAX_MB * 1024 * 1024)
+        )
+
+    def add_bytes(self, size):
+        with self._lock:
+            self.bytes += size
+
+    def summary(self):
+        """What is left of the limits, or "" if there are none."""
+        left = []
+        if MAX_PAGES:
+            left.append(f"{max(0, MAX_PAGES - self.pages)} of {MAX_PAGES} pages")
+        if MAX_MB:
+            remaining = max(0, MAX_MB * 1024 * 1024 - self.bytes) / (1024 * 1024)
+            left.append(f"{remaining:.1f} of {MAX_MB} MB")
+        if MAX_MINUTES:
+            remaining = max(0, MAX_MINUTES * 60 - (time.monotonic() - self.started))
+            left.append(f"{remaining / 60:.1f} of {MAX_MINUTES} minutes")
+        return f"Budget left: {', '.join(left)}" if left else ""
+
+
+class Frontier:
+    """FIFO queue of (url, depth) with an O(1) seen-or-queued set."""
+
+    def __init__(self, start_url):
+        self._queue = collections.deque([(start_url, 0)])
+        self._seen = {start_url}
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __contains__(self, url):
+        return url in self._seen
+
+    def push(self, url, depth):
+        if url not in self._seen:
+            self._seen.add(url)
+            self._queue.append((url, depth))
+
+    def pop(self):
+        return self._queue.popleft()
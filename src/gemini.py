@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 from urllib.parse import urlparse, urljoin
 from bs4 import BeautifulSoup
 import tkinter as tk
@@ -8,17 +7,22 @@ from tkinter import ttk, filedialog, messagebox
 import threading
 from openpyxl import Workbook
 
+from crawlkit import Transport
+
+# BeautifulSoup tree builder; "lxml" is much faster than "html.parser"
+HTML_PARSER = "lxml"
+
 
 # ---------- Helper Functions ----------
 def sanitize_filename(name):
     return "".join(c for c in name if c.isalnum() or c in "._-")
 
 
-def download_media(url, folder, log_panel):
+def download_media(url, folder, log_panel, transport):
     try:
         if url.startswith("//"):
             url = "https:" + url
-        r = requests.get(url, stream=True, timeout=15)
+        r = transport.get(url, stream=True, timeout=15)
         r.raise_for_status()
         filename = os.path.join(folder, sanitize_filename(url.split("/")[-1]))
         with open(filename, "wb") as f:
@@ -36,46 +40,52 @@ def download_media(url, folder, log_panel):
 def scrape_website(
     url, output_dir, log_panel, progress_var, export_json=True, export_excel=True
 ):
+    transport = Transport({}, 1)
     try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to fetch URL: {e}")
-        return
-
-    soup = BeautifulSoup(r.text, "html.parser")
-    domain = urlparse(url).netloc
-    domain_folder = os.path.join(output_dir, sanitize_filename(domain))
-    os.makedirs(domain_folder, exist_ok=True)
-
-    # Collect images and videos
-    media_urls = set()
-    for img in soup.find_all("img"):
-        src = img.get("src") or img.get("data-src")
-        if src:
-            media_urls.add(urljoin(url, src))
-        srcset = img.get("srcset")
-        if srcset:
-            largest = srcset.split(",")[-1].split()[0]
-            media_urls.add(urljoin(url, largest))
-    for video in soup.find_all("video"):
-        src = video.get("src")
-        if src:
-            media_urls.add(urljoin(url, src))
-        for source in video.find_all("source"):
-            src = source.get("src")
-            if src:
-                media_urls.add(urljoin(url, src))
+        try:
+            r = transport.get(url, timeout=15)
+            r.raise_for_status()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to fetch URL: {e}")
+            return
 
-    results = []
-    total = len(media_urls)
-    progress_step = 100 / max(total, 1)
+        soup = BeautifulSoup(r.text, HTML_PARSER)
+        domain = urlparse(url).netloc
+        domain_folder = os.path.join(output_dir, sanitize_filename(domain))
+        os.makedirs(domain_folder, exist_ok=True)
 
-    for i, m_url in enumerate(media_urls, 1):
-        filename = download_media(m_url, domain_folder, log_panel)
-        if filename:
-            results.append({"url": m_url, "file": filename})
-        progress_var.set(i * progress_step)
+        # Collect images and videos
+        media_urls = set()
+        for img in soup.find_all("img"):
+            src = img.get("src") or img.get("data-src")
+            if src:
+                media_urls.add(urljoin(url, src))
+            srcset = img.get("srcset")
+            if srcset:
+                largest = srcset.split(",")[-1].split()[0]
+                media_urls.add(urljoin(url, largest))
+        for video in soup.find_all("video"):
+            src = video.get("src")
+            if src:
+                media_urls.add(urljoin(url, src))
+            for source in video.find_all("source"):
+                src = source.get("src")
+                if src:
+                    media_urls.add(urljoin(url, src))
+
+        results = []
+        total = len(media_urls)
+        progress_step = 100 / max(total, 1)
+
+        for i, m_url in enumerate(media_urls, 1):
+            filename = download_media(m_url, domain_folder, log_panel, transport)
+            if filename:
+                results.append({"url": m_url, "file": filename})
+            progress_var.set(i * progress_step)
+
+        log_panel.insert(tk.END, transport.summary())
+    finally:
+        transport.close()
 
     # Save JSON
     if export_json:
@@ -11,9 +11,13 @@ import csv
 import threading
 import queue
 from datetime import datetime
-import collections
 import pyperclip
 
+from crawlkit import CrawlBudget, Frontier, Transport
+
+# BeautifulSoup tree builder; "lxml" is much faster than "html.parser"
+HTML_PARSER = "lxml"
+
 
 class ScraperApp(ttk.Window):
     def __init__(self):
@@ -25,6 +29,7 @@ class ScraperApp(ttk.Window):
         self.stop_event = threading.Event()
         self.log_queue = queue.Queue()
         self.error_logs = []
+        self.transport = None
         # The file count is now an attribute initialized in build_status_tab
         self.file_count = tk.IntVar(value=0)
         self.after(100, self.process_queue)
@@ -354,27 +359,30 @@ class ScraperApp(ttk.Window):
     def scrape(self, start_url, base_path, images_path, videos_path):
         options = {k: v.get() for k, v in self.options.items()}
 
-        to_visit = collections.deque([(start_url, 0)])
-        # Use (URL, current_depth) in visited to allow revisiting at different depths if necessary, but here we keep it simple with just URL
-        visited = set()
+        # The frontier remembers every queued URL, so each page is visited once
+        to_visit = Frontier(start_url)
+        self.budget = CrawlBudget()
+        self.budget.admit(start_url, 0)
         data = []
-        max_depth = 3
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        # Pages and downloads reuse the same kept-alive connections
+        self.transport = Transport(headers, 2, self.stop_event)
 
         while to_visit and not self.stop_event.is_set():
-            url, current_depth = to_visit.popleft()
-            if url in visited or current_depth > max_depth:
-                continue
-            visited.add(url)
+            if self.budget.used_up():
+                self.log_queue.put(("log", "Crawl budget used up, stopping.\n"))
+                break
+            url, current_depth = to_visit.pop()
             self.log_queue.put(("log", f"Scraping {url} (depth {current_depth})...\n"))
 
             try:
                 # Set a shorter timeout for large recursive scrapes
-                resp = requests.get(url, timeout=15, headers=headers)
+                resp = self.transport.get(url, timeout=15, headers=headers)
                 resp.raise_for_status()
-                soup = BeautifulSoup(resp.text, "html.parser")
+                self.budget.add_bytes(len(resp.content))
+                soup = BeautifulSoup(resp.text, HTML_PARSER)
 
                 page_data = {"url": url}
 
@@ -508,14 +516,22 @@ class ScraperApp(ttk.Window):
                             is_internal
                             and options["Follow internal links (recursive scraping)"]
                         ) or (not is_internal and options["Follow external links"]):
-                            if link not in visited and current_depth + 1 <= max_depth:
-                                to_visit.append((link, current_depth + 1))
+                            if link not in to_visit and self.budget.admit(
+                                link, current_depth + 1
+                            ):
+                                to_visit.push(link, current_depth + 1)
 
             except requests.exceptions.RequestException as e:
                 error_msg = f"Error scraping {url}: {str(e)}"
                 self.log_queue.put(("log", error_msg + "\n"))
                 self.error_logs.append(error_msg)
 
+        self.log_queue.put(("log", self.transport.summary() + ".\n"))
+        self.transport.close()
+        summary = self.budget.summary()
+        if summary:
+            self.log_queue.put(("log", summary + ".\n"))
+
         # --- 8. Save Final JSON/CSV ---
         if data and not self.stop_event.is_set():
             if options["Save as JSON"]:
@@ -584,7 +600,9 @@ class ScraperApp(ttk.Window):
             # Request the file
             timeout = 10 if file_type == "video" else 5
             # Use stream=True for potentially large files (videos/images)
-            resp = requests.get(file_url, timeout=timeout, headers=headers, stream=True)
+            resp = self.transport.get(
+                file_url, timeout=timeout, headers=headers, stream=True
+            )
             resp.raise_for_status()
 
             # Determine filename
@@ -613,6 +631,7 @@ class ScraperApp(ttk.Window):
                 for chunk in resp.iter_content(chunk_size=8192):
                     if chunk:
                         f.write(chunk)
+                        self.budget.add_bytes(len(chunk))
 
             self.log_queue.put(("log", f"Downloaded {file_type} {filename}\n"))
             self.log_queue.put(("inc_count", 1))
@@ -12,10 +12,25 @@ import json
 import csv
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import collections
 import pyperclip
 
+from crawlkit import CrawlBudget, Frontier, Transport
+
+# BeautifulSoup tree builder; "lxml" is much faster than "html.parser"
+HTML_PARSER = "lxml"
+
+# Images and videos download on their own pool; pages wait once this many
+# downloads per thread are queued
+MAX_DOWNLOADS = 4
+DOWNLOAD_BACKLOG = 32
+
+# Videos stream in large chunks and resume with Range requests after a
+# dropped connection, up to VIDEO_RETRIES times
+VIDEO_CHUNK_SIZE = 1 << 20
+VIDEO_RETRIES = 3
+
 
 class ScraperApp(ttk.Window):
     def __init__(self):
@@ -26,6 +41,9 @@ class ScraperApp(ttk.Window):
         self.stop_event = threading.Event()
         self.log_queue = queue.Queue()
         self.error_logs = []
+        self.download_pool = None
+        self.download_slots = None
+        self.transport = None
         self.after(100, self.process_queue)
         self.build_ui()
 
@@ -265,25 +283,32 @@ class ScraperApp(ttk.Window):
     def scrape(self, start_url, base_path, images_path, videos_path):
         options = {k: v.get() for k, v in self.options.items()}
 
-        to_visit = collections.deque([(start_url, 0)])
-        visited = set()
+        to_visit = Frontier(start_url)
+        self.budget = CrawlBudget()
+        self.budget.admit(start_url, 0)
         data = []
-        max_depth = 3
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
+        # Shared by the page loop and every download thread
+        self.transport = Transport(headers, MAX_DOWNLOADS + 1, self.stop_event)
+        self.download_pool = ThreadPoolExecutor(max_workers=MAX_DOWNLOADS)
+        self.download_slots = threading.BoundedSemaphore(
+            MAX_DOWNLOADS * DOWNLOAD_BACKLOG
+        )
 
         while to_visit and not self.stop_event.is_set():
-            url, current_depth = to_visit.popleft()
-            if url in visited or current_depth > max_depth:
-                continue
-            visited.add(url)
+            if self.budget.used_up():
+                self.log_queue.put(("log", "Crawl budget used up, stopping.\n"))
+                break
+            url, current_depth = to_visit.pop()
             self.log_queue.put(("log", f"Scraping {url} (depth {current_depth})\n"))
 
             try:
-                resp = requests.get(url, timeout=10, headers=headers)
+                resp = self.transport.get(url, timeout=10, headers=headers)
                 resp.raise_for_status()
-                soup = BeautifulSoup(resp.text, "html.parser")
+                self.budget.add_bytes(len(resp.content))
+                soup = BeautifulSoup(resp.text, HTML_PARSER)
 
                 page_data = {"url": url}
 
@@ -344,39 +369,9 @@ class ScraperApp(ttk.Window):
                     imgs = soup.find_all("img", src=True)
                     for img in imgs:
                         img_url = urljoin(url, img["src"])
-                        try:
-                            if not img_url or not any(
-                                img_url.lower().endswith(ext)
-                                for ext in (".jpg", ".jpeg", ".png", ".gif", ".bmp")
-                            ):
-                                error_msg = f"Skipping invalid image URL {img_url}"
-                                self.log_queue.put(("log", error_msg + "\n"))
-                                self.error_logs.append(error_msg)
-                                continue
-                            img_resp = requests.get(img_url, timeout=5, headers=headers)
-                            img_resp.raise_for_status()
-                            img_path = urlparse(img_url).path
-                            filename = os.path.basename(img_path)
-                            if not filename or os.path.isdir(
-                                os.path.join(images_path, filename)
-                            ):
-                                filename = f"image_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.jpg"
-                            full_path = os.path.join(images_path, filename)
-                            if os.path.isdir(full_path):
-                                error_msg = f"Cannot save image to {full_path}: Path is a directory"
-                                self.log_queue.put(("log", error_msg + "\n"))
-                                self.error_logs.append(error_msg)
-                                continue
-                            with open(full_path, "wb") as f:
-                                f.write(img_resp.content)
-                            self.log_queue.put(
-                                ("log", f"Downloaded {img_url} to {full_path}\n")
-                            )
-                            self.log_queue.put(("inc_count", 1))
-                        except (requests.exceptions.RequestException, OSError) as e:
-                            error_msg = f"Error downloading {img_url}: {str(e)}"
-                            self.log_queue.put(("log", error_msg + "\n"))
-                            self.error_logs.append(error_msg)
+                        self.queue_download(
+                            self.download_image, img_url, images_path, headers
+                        )
 
                 if options["Download all videos from <video> tags"]:
                     videos = soup.find_all("video")
@@ -386,10 +381,14 @@ class ScraperApp(ttk.Window):
                         if sources:
                             for source in sources:
                                 video_url = urljoin(url, source["src"])
-                                self.download_video(video_url, videos_path, headers)
+                                self.queue_download(
+                                    self.download_video, video_url, videos_path, headers
+                                )
                         elif video.get("src"):
                             video_url = urljoin(url, video["src"])
-                            self.download_video(video_url, videos_path, headers)
+                            self.queue_download(
+                                self.download_video, video_url, videos_path, headers
+                            )
 
                 if options["Save raw HTML"]:
                     try:
@@ -429,8 +428,10 @@ class ScraperApp(ttk.Window):
                                     "Follow internal links (recursive scraping)"
                                 ]
                             ) or (not is_internal and options["Follow external links"]):
-                                if link not in visited:
-                                    to_visit.append((link, current_depth + 1))
+                                if link not in to_visit and self.budget.admit(
+                                    link, current_depth + 1
+                                ):
+                                    to_visit.push(link, current_depth + 1)
                     except Exception as e:
                         error_msg = f"Error processing links for {url}: {str(e)}"
                         self.log_queue.put(("log", error_msg + "\n"))
@@ -441,6 +442,14 @@ class ScraperApp(ttk.Window):
                 self.log_queue.put(("log", error_msg + "\n"))
                 self.error_logs.append(error_msg)
 
+        # Queued downloads are dropped when stopped, finished otherwise
+        self.download_pool.shutdown(wait=True, cancel_futures=self.stop_event.is_set())
+        self.log_queue.put(("log", self.transport.summary() + ".\n"))
+        self.transport.close()
+        summary = self.budget.summary()
+        if summary:
+            self.log_queue.put(("log", summary + ".\n"))
+
         if options["Save as JSON"] and data and not self.stop_event.is_set():
             try:
                 json_path = os.path.join(base_path, "data.json")
@@ -474,7 +483,55 @@ class ScraperApp(ttk.Window):
         self.log_queue.put(("log", "Scraping completed.\n"))
         self.log_queue.put(("done",))
 
+    def queue_download(self, download, file_url, save_path, headers):
+        """Hands an image/video download to the download pool.
+
+        Blocks while the backlog is full, so the page loop slows down instead
+        of queueing downloads without bound.
+        """
+        while not self.download_slots.acquire(timeout=0.5):
+            if self.stop_event.is_set():
+                return
+        future = self.download_pool.submit(download, file_url, save_path, headers)
+        future.add_done_callback(lambda _: self.download_slots.release())
+
+    def download_image(self, img_url, images_path, headers):
+        if self.stop_event.is_set():
+            return
+        try:
+            if not img_url or not any(
+                img_url.lower().endswith(ext)
+                for ext in (".jpg", ".jpeg", ".png", ".gif", ".bmp")
+            ):
+                error_msg = f"Skipping invalid image URL {img_url}"
+                self.log_queue.put(("log", error_msg + "\n"))
+                self.error_logs.append(error_msg)
+                return
+            img_resp = self.transport.get(img_url, timeout=5, headers=headers)
+            img_resp.raise_for_status()
+            img_path = urlparse(img_url).path
+            filename = os.path.basename(img_path)
+            if not filename or os.path.isdir(os.path.join(images_path, filename)):
+                filename = f"image_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.jpg"
+            full_path = os.path.join(images_path, filename)
+            if os.path.isdir(full_path):
+                error_msg = f"Cannot save image to {full_path}: Path is a directory"
+                self.log_queue.put(("log", error_msg + "\n"))
+                self.error_logs.append(error_msg)
+                return
+            with open(full_path, "wb") as f:
+                f.write(img_resp.content)
+            self.budget.add_bytes(len(img_resp.content))
+            self.log_queue.put(("log", f"Downloaded {img_url} to {full_path}\n"))
+            self.log_queue.put(("inc_count", 1))
+        except (requests.exceptions.RequestException, OSError) as e:
+            error_msg = f"Error downloading {img_url}: {str(e)}"
+            self.log_queue.put(("log", error_msg + "\n"))
+            self.error_logs.append(error_msg)
+
     def download_video(self, video_url, videos_path, headers):
+        if self.stop_event.is_set():
+            return
         try:
             if not video_url or not any(
                 video_url.lower().endswith(ext)
@@ -484,10 +541,6 @@ class ScraperApp(ttk.Window):
                 self.log_queue.put(("log", error_msg + "\n"))
                 self.error_logs.append(error_msg)
                 return
-            video_resp = requests.get(
-                video_url, timeout=10, headers=headers, stream=True
-            )
-            video_resp.raise_for_status()
             video_path = urlparse(video_url).path
             filename = os.path.basename(video_path)
             if not filename or os.path.isdir(os.path.join(videos_path, filename)):
@@ -498,17 +551,81 @@ class ScraperApp(ttk.Window):
                 self.log_queue.put(("log", error_msg + "\n"))
                 self.error_logs.append(error_msg)
                 return
-            with open(full_path, "wb") as f:
-                for chunk in video_resp.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Per thread, as two pages may link the same video at once
+            part_path = f"{full_path}.{threading.get_ident()}.part"
+            try:
+                self.fetch_video(video_url, part_path, headers)
+                if self.stop_event.is_set():
+                    return
+                self.budget.add_bytes(os.path.getsize(part_path))
+                os.replace(part_path, full_path)
+            finally:
+                if os.path.exists(part_path):
+                    # Stopped or failed: don't leave a truncated video behind
+                    os.remove(part_path)
             self.log_queue.put(("log", f"Downloaded {video_url} to {full_path}\n"))
             self.log_queue.put(("inc_count", 1))
-        except (requests.exceptions.RequestException, OSError) as e:
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
             error_msg = f"Error downloading {video_url}: {str(e)}"
             self.log_queue.put(("log", error_msg + "\n"))
             self.error_logs.append(error_msg)
 
+    def fetch_video(self, video_url, part_path, headers):
+        """Streams a video into part_path, resuming after dropped connections.
+
+        Raises ValueError if the final size does not match Content-Length.
+        """
+        # Byte ranges must refer to the bytes as stored
+        headers = {**headers, "Accept-Encoding": "identity"}
+        size, total, validator = 0, None, None
+        with open(part_path, "wb", buffering=VIDEO_CHUNK_SIZE) as f:
+            for attempt in range(VIDEO_RETRIES):
+                request_headers = dict(headers)
+                if size:
+                    request_headers.update(
+                        {"Range": f"bytes={size}-", "If-Range": validator}
+                    )
+                try:
+                    video_resp = self.transport.get(
+                        video_url, timeout=10, headers=request_headers, stream=True
+                    )
+                    video_resp.raise_for_status()
+                    if size and video_resp.status_code != 206:
+                        # Changed on the server or no range support: start over
+                        f.seek(0)
+                        f.truncate()
+                        size = 0
+                    if not size:
+                        total = video_resp.headers.get("Content-Length")
+                        etag = video_resp.headers.get("ETag", "")
+                        validator = (
+                            etag
+                            if etag and not etag.startswith("W/")
+                            else video_resp.headers.get("Last-Modified")
+                        )
+                    with video_resp:
+                        for chunk in video_resp.iter_content(
+                            chunk_size=VIDEO_CHUNK_SIZE
+                        ):
+                            if self.stop_event.is_set():
+                                return
+                            f.write(chunk)
+                            size += len(chunk)
+                    break
+                except (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError,
+                    requests.exceptions.Timeout,
+                ) as e:
+                    # Only a validator makes it safe to append the rest
+                    if not (size and validator) or attempt == VIDEO_RETRIES - 1:
+                        raise
+                    self.log_queue.put(
+                        ("log", f"Resuming {video_url} at byte {size}: {str(e)}\n")
+                    )
+        if total is not None and size != int(total):
+            raise ValueError(f"incomplete download, {size} of {total} bytes")
+
 
 if __name__ == "__main__":
     app = ScraperApp()
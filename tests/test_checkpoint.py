@@ -0,0 +1,129 @@
+import http.server
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from checkpoint import CrawlCheckpoint
+from scraper_core import ScraperCore
+
+PAGES = 900
+
+UI_OPTIONS = {
+    "Extract all URLs from <a> tags": False,
+    "Download all images from <img> tags": False,
+    "Download all videos from <video> tags": False,
+    "Extract text content": True,
+    "Extract metadata (title, description, keywords)": True,
+    "Follow internal links (recursive scraping)": True,
+    "Follow external links": False,
+    "Save as JSON": True,
+    "Save as CSV": False,
+    "Save raw HTML": False,
+}
+
+
+class SiteHandler(http.server.BaseHTTPRequestHandler):
+    """/ links every page; each page is slow enough to kill a crawl midway."""
+
+    def do_GET(self):
+        if self.path == "/":
+            body = "".join(f'<a href="/p{i}.html">{i}</a>' for i in range(PAGES))
+        else:
+            time.sleep(0.005)
+            body = f"<title>{self.path}</title><p>Page {self.path}</p>"
+        data = f"<html><body>{body}</body></html>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def crawl(url, base_path, resume, interval=0, compression="none"):
+    options = {
+        **UI_OPTIONS,
+        "JSON Lines compression": compression,
+        "Max depth": 1,
+        "Concurrent crawling": False,
+        "Checkpoint interval (seconds)": interval,
+        "Resume previous crawl": resume,
+    }
+    log_queue = queue.Queue()
+    core = ScraperCore(
+        url, base_path, base_path, base_path, options, log_queue, threading.Event()
+    )
+    core.run()
+    return log_queue
+
+
+def test_journal_is_written_only_on_flush(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path))
+    checkpoint.open("http://example.com/", resume=False)
+    checkpoint.queued("http://example.com/a", 1)
+    checkpoint.finished("http://example.com/a")
+    assert checkpoint.load("http://example.com/") is None
+
+    checkpoint.flush()
+    assert checkpoint.load("http://example.com/") == (
+        [("http://example.com/a", 1)],
+        {"http://example.com/a"},
+    )
+    checkpoint.close()
+
+
+def test_empty_journal_is_not_resumed(tmp_path):
+    open(tmp_path / CrawlCheckpoint.FILENAME, "w").close()
+    assert CrawlCheckpoint(str(tmp_path)).load("http://example.com/") is None
+
+
+def kill_and_resume(site, base_path, interval, compression="none"):
+    context = multiprocessing.get_context("spawn")
+    child = context.Process(
+        target=crawl, args=(site, base_path, False, interval, compression)
+    )
+    child.start()
+    # Starting the child can take a while; only then give it time to crawl
+    deadline = time.monotonic() + 60
+    while CrawlCheckpoint(base_path).load(site) is None:
+        assert time.monotonic() < deadline and child.is_alive()
+        time.sleep(0.05)
+    time.sleep(1)
+    child.kill()
+    child.join()
+    assert not os.path.exists(os.path.join(base_path, "data.json"))
+    assert CrawlCheckpoint(base_path).load(site) is not None
+
+    crawl(site, base_path, True, compression=compression)
+    with open(os.path.join(base_path, "data.json"), encoding="utf-8") as f:
+        urls = {page["url"] for page in json.load(f)}
+    assert urls == {site} | {f"{site}p{i}.html" for i in range(PAGES)}
+
+
+def test_resume_after_kill_loses_no_pages(site, tmp_path):
+    # A long interval, so nothing but buffer sizes decides what reaches disk
+    kill_and_resume(site, str(tmp_path), 3600)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_resume_after_kill_loses_no_pages(site, tmp_path, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    # Checkpoints all the time, so pages are journaled while their results
+    # may still sit in the compressor
+    kill_and_resume(site, str(tmp_path), 0, compression)
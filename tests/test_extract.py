@@ -0,0 +1,51 @@
+import pytest
+
+from charset import sniff_encoding
+from extract import PARSERS, extract_html
+
+URL = "http://example.com/dir/page.html"
+
+PAGES = {
+    "script and style": """<html><head><title>Scripts</title>
+        <meta name="description" content="Has code">
+        <style>body { color: red }</style>
+        <script>var a = "<a href='/fake'>no</a>";</script></head>
+        <body><p>Visible <b>text</b></p><script>document.write("x")</script>
+        <a href="/real">Real link</a></body></html>""",
+    "template": """<html><head><title>Template</title></head><body>
+        <template><a href="/templated">Hidden</a><p>Template text</p></template>
+        <a href="other.html">Other</a> <a href="mailto:a@example.com">Mail</a>
+        </body></html>""",
+    "nested video": """<html><head><title>Video</title></head><body>
+        <video src="/direct.mp4"></video>
+        <video poster="/poster.jpg"><source src="/a.webm" type="video/webm">
+        <source src="b.mp4"><track src="/subs.vtt"></video>
+        <div><video><source src="https://cdn.example.com/c.mp4"></video></div>
+        <img src="/img.png" alt="Picture"></body></html>""",
+    "missing title": """<html><head>
+        <meta name="keywords" content="no, title"></head>
+        <body><h1>Heading only</h1><a href="#top">Top</a>
+        <a href="https://example.org/x?y=1">External</a></body></html>""",
+}
+
+# Windows-1252 bytes that are not valid UTF-8
+CP1252_PAGE = (
+    b'<html><head><meta charset="windows-1252"><title>Caf\xe9</title></head>'
+    b'<body><p>Na\xefve \x93quotes\x94</p><a href="/men\xfc">Men\xfc</a>'
+    b"</body></html>"
+)
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+@pytest.mark.parametrize("parser", PARSERS[1:])
+def test_backends_extract_the_same_features(name, parser):
+    reference = extract_html(PAGES[name], URL, "html.parser", want_anchors=True)
+    assert extract_html(PAGES[name], URL, parser, want_anchors=True) == reference
+
+
+@pytest.mark.parametrize("parser", PARSERS[1:])
+def test_backends_agree_on_non_utf8_bytes(parser):
+    encoding, _ = sniff_encoding(CP1252_PAGE)
+    reference = extract_html(CP1252_PAGE, URL, "html.parser", encoding=encoding)
+    assert reference["title"] == "Café"
+    assert extract_html(CP1252_PAGE, URL, parser, encoding=encoding) == reference
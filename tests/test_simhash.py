@@ -0,0 +1,35 @@
+from simhash import NearDuplicateIndex, distance, simhash
+
+SHORT_PAGES = ["Login", "Contact", "Gallery photos", "About us", "Home"]
+
+
+def test_short_texts_get_distinct_fingerprints():
+    fingerprints = [simhash(text) for text in SHORT_PAGES]
+    assert 0 not in fingerprints
+    assert len(set(fingerprints)) == len(SHORT_PAGES)
+
+
+def test_short_pages_are_not_near_duplicates():
+    index = NearDuplicateIndex(max_distance=6)
+    for i, text in enumerate(SHORT_PAGES):
+        assert index.check(f"http://example.com/{i}", simhash(text)) is None
+    assert index.duplicates == 0
+
+
+def test_same_short_text_is_a_duplicate():
+    index = NearDuplicateIndex(max_distance=6)
+    assert index.check("http://example.com/a", simhash("Login")) is None
+    assert index.check("http://example.com/b", simhash("login")) == (
+        "http://example.com/a"
+    )
+
+
+def test_text_without_words_has_no_fingerprint():
+    assert simhash("") is None
+    assert simhash(" -- ") is None
+
+
+def test_small_edit_stays_close():
+    text = " ".join(f"word{i}" for i in range(200))
+    edited = text.replace("word100", "changed")
+    assert distance(simhash(text), simhash(edited)) <= 6
@@ -0,0 +1,60 @@
+import csv
+import os
+
+from sinks import CsvSink
+
+
+def page(url, **fields):
+    return {"url": url, "links": [url + "#link"], **fields}
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def crash(sink):
+    # Buffers reach the disk, close() never runs
+    sink._file.close()
+    sink._lists_file.close()
+
+
+def test_new_column_rewrites_header_on_flush(tmp_path):
+    sink = CsvSink(tmp_path)
+    sink.write(page("http://a/1", title="one"))
+    sink.write(page("http://a/2", title="two", text="body"))
+    sink.flush()
+    crash(sink)
+
+    header, *rows = read_csv(os.path.join(tmp_path, "data.csv"))
+    assert header == ["title", "url", "text"]
+    assert rows == [["one", "http://a/1", ""], ["two", "http://a/2", "body"]]
+
+
+def test_resume_drops_rows_of_unfinished_pages(tmp_path):
+    sink = CsvSink(tmp_path)
+    sink.write(page("http://a/1", title="one"))
+    sink.write(page("http://a/2", title="two", text="body"))
+    sink.flush()
+    # Not checkpointed, and adds a column the header on disk doesn't have
+    sink.write(page("http://a/3", title="three", description="new"))
+    crash(sink)
+
+    sink = CsvSink(tmp_path, finished={"http://a/1", "http://a/2"})
+    sink.write(page("http://a/3", title="three", description="new"))
+    sink.close()
+
+    with open(os.path.join(tmp_path, "data.csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["url"] for row in rows] == ["http://a/1", "http://a/2", "http://a/3"]
+    assert rows[1]["text"] == "body"
+    assert rows[2]["description"] == "new"
+    assert rows[2]["text"] == ""
+
+    lists = read_csv(os.path.join(tmp_path, "data_lists.csv"))
+    assert [row[0] for row in lists] == [
+        "url",
+        "http://a/1",
+        "http://a/2",
+        "http://a/3",
+    ]